@@ -1,50 +1,185 @@
+import asyncio
+import contextlib
+import json
 import logging
 import os
 import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime
 
-import aiofiles
-import uvicorn
-from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Form
-from passlib.context import CryptContext
+from fastapi import FastAPI, Depends, HTTPException, UploadFile, File
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from sqlalchemy import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
-from app.backend.schemas import PredictionRequest, UserCreate, UserLogin
+from app.backend.jobs import PENDING_STATUSES, Job, JobQueueFull, job_queue
+from app.backend.prediction_cache import prediction_cache
+from app.backend.schemas import BulkPredictionRequest, PredictionRequest, UserCreate, UserLogin
+from app.backend.security import (
+    create_access_token,
+    get_current_user,
+    hash_password,
+    shutdown_hash_executor,
+    verify_and_update_password,
+)
+from app.backend.uploads import UploadSizeLimitMiddleware, save_upload
 from app.config import Config
-from app.db.main import get_db
+from app.db import main as db_main
+from app.db.main import dispose_engine, get_db, init_engine, pool_stats
 from app.db.models import User, ImageUpload, PredictionResult
-from app.image_processing.predict import predict_all_digits
-from app.image_processing.segmentation import segment_with_resnet
-
-# 1. Disable SQLAlchemy engine logs
+from app.image_processing.executor import pipeline_executor
+from app.image_processing.model_registry import model_registry
+from app.image_processing.pipeline import count_pages, recognize, recognize_many, recognize_pages
+from app.image_processing.scheduler import inference_scheduler
+from app.image_processing.workspace import scratch_workspace
+from app.metrics import MetricsMiddleware, registry as metrics_registry, stage_timer
+from app.profiling import ProfilingMiddleware, enabled as profiling_enabled, span
+
+# Per-request visibility comes from /metrics; logs carry errors and lifecycle events.
+# SQL statement logging is controlled by DB_ECHO instead of the sqlalchemy.engine logger.
+logging.basicConfig(level=Config.LOG_LEVEL, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
 logging.getLogger("sqlalchemy.engine").setLevel(logging.WARNING)
+logger = logging.getLogger(__name__)
 
-# 2. Disable FastAPI / Uvicorn logs
-logging.getLogger("uvicorn").setLevel(logging.CRITICAL)
-logging.getLogger("uvicorn.error").setLevel(logging.CRITICAL)
-logging.getLogger("uvicorn.access").setLevel(logging.CRITICAL)
+UPLOAD_DIR = Config.UPLOAD_DIR
 
-# 3. (Optional) Disable ALL logging globally
-logging.disable(logging.CRITICAL)
 
-# Ensure upload directory exists
-UPLOAD_DIR = Config.UPLOAD_DIR
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+async def recognize_cached(db, image_source, content_hash, user_id, model_version):
+    """Return (digits, cached); identical content already recognized by the same model skips the pipeline.
+
+    The result is cached under content_hash, so callers must keep multi-page files out of here.
+    """
+    with span("cache_lookup"):
+        output = await prediction_cache.lookup(db, content_hash, model_version)
+    if output is not None:
+        return output, True
+
+    # Crops stay in memory; only debug mode writes them, into a workspace of this request alone
+    if Config.DEBUG_SAVE_SEGMENTS:
+        with scratch_workspace(prefix=f"user_{user_id}-", keep=True) as debug_dir:
+            output = await recognize(image_source, debug_dir=debug_dir)
+    else:
+        # Segment and classify off the event loop
+        output = await recognize(image_source)
+    if content_hash:
+        prediction_cache.put((content_hash, model_version), str(output))
+    return output, False
+
+
+async def predict_pages(db, image_upload, model_version, pages=None):
+    """Recognize an upload page by page, yielding one result dict per page.
+
+    Each page's PredictionResult is committed as soon as the page is done, so memory stays
+    at one decoded page however long the document is, and finished pages are already in
+    the database while later ones run. A page that fails is reported and skipped.
+    """
+    workspace = contextlib.nullcontext()
+    if Config.DEBUG_SAVE_SEGMENTS:
+        workspace = scratch_workspace(prefix=f"user_{image_upload.user_id}-", keep=True)
+    with workspace as debug_dir:
+        async for page, output in recognize_pages(image_upload.image_path, debug_dir, pages):
+            if isinstance(output, BaseException):
+                logger.warning("Page %s of image %s failed: %s", page, image_upload.image_id, output)
+                yield {"page": page, "status": "error", "error": str(output)}
+                continue
+
+            prediction_result = PredictionResult(
+                image_id=image_upload.image_id,
+                page=page,
+                predicted_digit=str(output),
+                confidence_score=None,
+                model_version=model_version
+            )
+            db.add(prediction_result)
+            with stage_timer("db_write"):
+                await db.commit()
+            yield {
+                "page": page,
+                "status": "ok",
+                "predicted_digit": output,
+                "prediction_id": prediction_result.prediction_id,
+            }
+
+
+async def run_job(job: Job):
+    """Job queue runner: recognize a queued upload and return (digits, model_version)."""
+    pages = await count_pages(job.image_path)
+    if pages > 1:
+        raise ValueError(f"Multi-page image ({pages} pages): use /predict or /predict/pages")
+    model_version = model_registry.version
+    async with db_main.AsyncSessionLocal() as session:
+        output, _ = await recognize_cached(session, job.image_path, job.content_hash, job.user_id, model_version)
+    return str(output), model_version
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Nothing touches the disk or the database at import time; schema is managed by Alembic
+    Config.ensure_directories()
+    init_engine()
+
+    # Load the classifier once per worker so requests never pay the checkpoint read.
+    # This is also where torch, torchvision and cv2 are first imported.
+    await model_registry.load()
+    model_registry.start_watcher()
+    pipeline_executor.start()
+    await pipeline_executor.warmup()
+    inference_scheduler.start()
+    job_queue.start(run_job)
+    yield
+    await job_queue.stop()
+    await inference_scheduler.stop()
+    pipeline_executor.shutdown()
+    shutdown_hash_executor()
+    await model_registry.stop_watcher()
+    await dispose_engine()
 
-# Password hashing context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 # Initialize FastAPI
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(UploadSizeLimitMiddleware, paths={"/upload_image", "/recognize"})
+if profiling_enabled():
+    app.add_middleware(ProfilingMiddleware, paths={"/predict", "/predict/bulk", "/predict/pages", "/recognize"})
+app.add_middleware(MetricsMiddleware)
+
+
+def _stat_gauge(stats):
+    return lambda: {(key,): value for key, value in stats().items() if isinstance(value, (int, float))}
+
+
+for _name, _documentation, _stats in (
+    ("inference_scheduler", "Inference scheduler state and totals.", inference_scheduler.stats),
+    ("prediction_jobs", "Prediction job queue state and totals.", job_queue.stats),
+    ("prediction_cache", "Prediction cache size and hit counts.", prediction_cache.stats),
+    ("db_pool", "Database connection pool state and checkout waits.", pool_stats),
+):
+    metrics_registry.gauge(_name, _documentation, _stat_gauge(_stats), ("stat",))
+
 
+@app.get("/health")
+async def health():
+    status = model_registry.status()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
 
-# Utility functions for password hashing
-def hash_password(password: str):
-    return pwd_context.hash(password)
 
+@app.get("/inference/stats")
+async def inference_stats():
+    return {
+        "scheduler": inference_scheduler.stats(),
+        "prediction_cache": prediction_cache.stats(),
+        "jobs": job_queue.stats(),
+    }
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+
+@app.get("/db/stats")
+async def db_stats():
+    return pool_stats()
+
+
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
 
 
 @app.post("/signup")
@@ -56,7 +191,7 @@ async def signup(user: UserCreate, db: AsyncSession = Depends(get_db)):
         if db_user:
             raise HTTPException(status_code=400, detail="Email already registered")
 
-        hashed_password = hash_password(user.user_password)
+        hashed_password = await hash_password(user.user_password)
         new_user = User(user_email=user.user_email, user_password=hashed_password)
         session.add(new_user)
         await session.commit()
@@ -71,86 +206,419 @@ async def login(user: UserLogin, db: AsyncSession = Depends(get_db)):
         result = await session.execute(select(User).where(User.user_email == user.user_email))
         db_user = result.scalars().first()
 
-        if not db_user or not verify_password(user.user_password, db_user.user_password):
+        if not db_user:
             raise HTTPException(status_code=400, detail="Invalid credentials")
 
-        return {"message": "Login successful", "user_id": db_user.user_id, "user_email": db_user.user_email}
+        valid, new_hash = await verify_and_update_password(user.user_password, db_user.user_password)
+        if not valid:
+            raise HTTPException(status_code=400, detail="Invalid credentials")
+
+        # Transparently move the stored hash to the configured bcrypt cost
+        if new_hash:
+            db_user.user_password = new_hash
+            await session.commit()
+
+        return {
+            "message": "Login successful",
+            "user_id": db_user.user_id,
+            "user_email": db_user.user_email,
+            "access_token": create_access_token(db_user.user_id, db_user.user_email),
+            "token_type": "bearer",
+            "expires_in": Config.ACCESS_TOKEN_TTL,
+        }
 
 
 @app.post("/upload_image")
 async def upload_image(
-        user_id: int = Form(...),
         image: UploadFile = File(...),
+        current_user: dict = Depends(get_current_user),
         db: AsyncSession = Depends(get_db)
 ):
+    user_id = int(current_user["sub"])
     try:
-        filename = f"{uuid.uuid4().hex}_{image.filename}"
+        filename = f"{uuid.uuid4().hex}_{os.path.basename(image.filename or 'upload')}"
         file_location = os.path.join(UPLOAD_DIR, filename)
 
-        # Save the uploaded image to disk
-        async with aiofiles.open(file_location, "wb") as buffer:
-            content = await image.read()
-            await buffer.write(content)
+        # Stream to disk in chunks, hashing and checking the header on the way
+        stored = await save_upload(image, file_location)
 
         async with db as session:
-            image_upload = ImageUpload(user_id=user_id, image_path=file_location)
+            image_upload = ImageUpload(
+                user_id=user_id,
+                image_path=file_location,
+                content_hash=stored.content_hash
+            )
             session.add(image_upload)
-            await session.commit()
-            await session.refresh(image_upload)
-
-        return {"message": "Image uploaded successfully", "image_id": image_upload.image_id}
-
+            with stage_timer("db_write"):
+                await session.commit()
+                await session.refresh(image_upload)
+
+        return {
+            "message": "Image uploaded successfully",
+            "image_id": image_upload.image_id,
+            "format": stored.format,
+            "width": stored.width,
+            "height": stored.height,
+            "size_bytes": stored.size_bytes,
+        }
+
+    except HTTPException:
+        raise
     except Exception as e:
+        logger.exception("Upload failed")
         raise HTTPException(status_code=500, detail=f"Error uploading image: {str(e)}")
 
 
 @app.post("/predict")
-async def predict(request: PredictionRequest, db: AsyncSession = Depends(get_db)):
+async def predict(
+        request: PredictionRequest,
+        current_user: dict = Depends(get_current_user),
+        db: AsyncSession = Depends(get_db)
+):
     try:
         # Fetch image details from the database
-        image_upload_result = await db.execute(
-            select(ImageUpload).filter(ImageUpload.image_id == request.image_id)
-        )
+        with span("db_read"):
+            image_upload_result = await db.execute(
+                select(ImageUpload).filter(ImageUpload.image_id == request.image_id)
+            )
         image_upload = image_upload_result.scalar_one_or_none()
 
-        if not image_upload:
+        if not image_upload or image_upload.user_id != int(current_user["sub"]):
             raise HTTPException(status_code=404, detail="Image not found")
 
-        image_path = image_upload.image_path
-        user_id = image_upload.user_id
-
-        # Create user-specific temp folder
-        user_folder = os.path.join(Config.TEMP_FOLDERS_PATH, f"user_{user_id}")
-        os.makedirs(user_folder, exist_ok=True)
+        if not model_registry.ready:
+            raise HTTPException(status_code=503, detail="Model not loaded")
 
-        # Perform segmentation (Fixed Argument Order)
-        output_dir = await segment_with_resnet(image_path, user_id, output_base_dir=user_folder)
+        model_version = model_registry.version
+        # Multi-page TIFFs get one stored prediction per page
+        pages = await count_pages(image_upload.image_path)
+        if pages > 1:
+            items = [item async for item in predict_pages(db, image_upload, model_version, pages)]
+            return {"page_count": pages, "pages": items}
 
-        # Predict digits
-        output = await predict_all_digits(user_id, Config.TEMP_FOLDERS_PATH)
+        output, cached = await recognize_cached(
+            db, image_upload.image_path, image_upload.content_hash, image_upload.user_id, model_version
+        )
 
         # Store prediction in database
         prediction_result = PredictionResult(
             image_id=request.image_id,
             predicted_digit=str(output),
-            confidence_score=None
+            confidence_score=None,
+            model_version=model_version
         )
         db.add(prediction_result)
-        await db.commit()
-        await db.refresh(prediction_result)
+        with stage_timer("db_write"):
+            await db.commit()
+            await db.refresh(prediction_result)
 
-        return {"predicted_digit": output, "prediction_id": prediction_result.prediction_id}
+        return {"predicted_digit": output, "prediction_id": prediction_result.prediction_id, "cached": cached}
 
+    except HTTPException:
+        await db.rollback()
+        raise
     except Exception as e:
+        logger.exception("Prediction failed for image %s", request.image_id)
         await db.rollback()  # Ensure rollback if anything fails
         raise HTTPException(status_code=500, detail=f"Error during prediction: {str(e)}")
 
 
+@app.post("/predict/bulk")
+async def predict_bulk(
+        request: BulkPredictionRequest,
+        current_user: dict = Depends(get_current_user),
+        db: AsyncSession = Depends(get_db)
+):
+    """Predict many uploaded images at once, reporting success or an error per image_id."""
+    image_ids = list(dict.fromkeys(request.image_ids))
+    if not image_ids:
+        raise HTTPException(status_code=422, detail="image_ids must not be empty")
+    if len(image_ids) > Config.BULK_PREDICT_MAX:
+        raise HTTPException(status_code=422, detail=f"At most {Config.BULK_PREDICT_MAX} image_ids per request")
+    if not model_registry.ready:
+        raise HTTPException(status_code=503, detail="Model not loaded")
+
+    model_version = model_registry.version
+    try:
+        # One IN query for every path; other users' images simply come back missing
+        result = await db.execute(
+            select(ImageUpload.image_id, ImageUpload.image_path, ImageUpload.content_hash)
+            .where(ImageUpload.image_id.in_(image_ids), ImageUpload.user_id == int(current_user["sub"]))
+        )
+        uploads = {row.image_id: row for row in result}
+
+        # A multi-page TIFF needs one prediction per page; unreadable files fail in the pipeline instead
+        page_counts = await asyncio.gather(
+            *(count_pages(row.image_path) for row in uploads.values()), return_exceptions=True
+        )
+        multi_page = {
+            image_id for image_id, pages in zip(uploads, page_counts)
+            if not isinstance(pages, BaseException) and pages > 1
+        }
+        single = [row for row in uploads.values() if row.image_id not in multi_page]
+        cached = await prediction_cache.lookup_many(db, [row.content_hash for row in single], model_version)
+
+        # Identical content inside the request is recognized once
+        def source_key(upload):
+            return upload.content_hash or f"image:{upload.image_id}"
+
+        pending = {}
+        for upload in single:
+            if upload.content_hash not in cached:
+                pending.setdefault(source_key(upload), upload.image_path)
+
+        keys = list(pending)
+        outputs = {}
+        for start in range(0, len(keys), Config.BULK_CHUNK_IMAGES):
+            chunk = keys[start:start + Config.BULK_CHUNK_IMAGES]
+            outputs.update(zip(chunk, await recognize_many([pending[key] for key in chunk])))
+
+        items, rows = [], []
+        now = datetime.utcnow()
+        for image_id in image_ids:
+            upload = uploads.get(image_id)
+            if upload is None:
+                items.append({"image_id": image_id, "status": "error", "error": "Image not found"})
+                continue
+            if image_id in multi_page:
+                items.append({"image_id": image_id, "status": "error", "error": "Multi-page image: use /predict/pages"})
+                continue
+
+            if upload.content_hash in cached:
+                output, was_cached = cached[upload.content_hash], True
+            else:
+                output, was_cached = outputs[source_key(upload)], False
+                if isinstance(output, BaseException):
+                    items.append({"image_id": image_id, "status": "error", "error": str(output)})
+                    continue
+                if upload.content_hash:
+                    prediction_cache.put((upload.content_hash, model_version), str(output))
+
+            items.append({"image_id": image_id, "status": "ok", "predicted_digit": output, "cached": was_cached})
+            rows.append({
+                "image_id": image_id,
+                "predicted_digit": str(output),
+                "model_version": model_version,
+                "prediction_time": now,
+                "status": "done",
+            })
+
+        # A single multi-row INSERT ... RETURNING for every successful prediction
+        if rows:
+            with stage_timer("db_write"):
+                prediction_ids = (await db.scalars(
+                    insert(PredictionResult).returning(PredictionResult.prediction_id, sort_by_parameter_order=True),
+                    rows
+                )).all()
+                await db.commit()
+            ok_items = (item for item in items if item["status"] == "ok")
+            for item, prediction_id in zip(ok_items, prediction_ids):
+                item["prediction_id"] = prediction_id
+
+        return {
+            "model_version": model_version,
+            "succeeded": len(rows),
+            "failed": len(items) - len(rows),
+            "items": items,
+        }
+
+    except HTTPException:
+        await db.rollback()
+        raise
+    except Exception as e:
+        logger.exception("Bulk prediction failed")
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=f"Error during bulk prediction: {str(e)}")
+
+
+@app.post("/predict/pages")
+async def predict_pages_stream(
+        request: PredictionRequest,
+        current_user: dict = Depends(get_current_user),
+        db: AsyncSession = Depends(get_db)
+):
+    """Stream one NDJSON line per page of an upload, each sent once its page is recognized and stored."""
+    result = await db.execute(select(ImageUpload).filter(ImageUpload.image_id == request.image_id))
+    image_upload = result.scalar_one_or_none()
+    if not image_upload or image_upload.user_id != int(current_user["sub"]):
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    if not model_registry.ready:
+        raise HTTPException(status_code=503, detail="Model not loaded")
+
+    try:
+        pages = await count_pages(image_upload.image_path)
+    except OSError as e:
+        logger.exception("Cannot open image %s", request.image_id)
+        raise HTTPException(status_code=500, detail=f"Error during prediction: {str(e)}")
+    model_version = model_registry.version
+
+    async def stream():
+        # The request's session is not meant to outlive the handler; pages are stored with their own
+        async with db_main.AsyncSessionLocal() as session:
+            async for item in predict_pages(session, image_upload, model_version, pages):
+                yield json.dumps({"image_id": image_upload.image_id, "page_count": pages, **item}) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+@app.post("/recognize")
+async def recognize_image(
+        image: UploadFile = File(...),
+        current_user: dict = Depends(get_current_user),
+        db: AsyncSession = Depends(get_db)
+):
+    """Upload and predict in one round-trip, decoding the bytes already in memory."""
+    if not model_registry.ready:
+        raise HTTPException(status_code=503, detail="Model not loaded")
+
+    user_id = int(current_user["sub"])
+    model_version = model_registry.version
+    filename = f"{uuid.uuid4().hex}_{os.path.basename(image.filename or 'upload')}"
+    file_location = os.path.join(UPLOAD_DIR, filename)
+    stored = None
+    try:
+        # The file is still kept for /predict and auditing, but never read back here
+        stored = await save_upload(image, file_location, keep_content=True)
+        if stored.format == "tiff" and await count_pages(file_location) > 1:
+            raise HTTPException(
+                status_code=422, detail="Multi-page image: upload it with /upload_image and use /predict/pages"
+            )
+
+        output, cached = await recognize_cached(db, stored.content, stored.content_hash, user_id, model_version)
+
+        # Both rows go in one transaction; flush assigns image_id without committing
+        with stage_timer("db_write"):
+            image_upload = ImageUpload(user_id=user_id, image_path=file_location, content_hash=stored.content_hash)
+            db.add(image_upload)
+            await db.flush()
+            prediction_result = PredictionResult(
+                image_id=image_upload.image_id,
+                predicted_digit=str(output),
+                confidence_score=None,
+                model_version=model_version
+            )
+            db.add(prediction_result)
+            await db.commit()
+
+        return {
+            "predicted_digit": output,
+            "image_id": image_upload.image_id,
+            "prediction_id": prediction_result.prediction_id,
+            "cached": cached,
+            "format": stored.format,
+            "width": stored.width,
+            "height": stored.height,
+        }
+
+    except Exception as e:
+        await db.rollback()
+        # save_upload cleans up after its own failures; drop files the DB never recorded
+        if stored is not None:
+            with contextlib.suppress(OSError):
+                os.remove(file_location)
+        if isinstance(e, HTTPException):
+            raise
+        logger.exception("Recognition failed")
+        raise HTTPException(status_code=500, detail=f"Error during recognition: {str(e)}")
+
+
+def _job_response(prediction: PredictionResult):
+    def elapsed_ms(start, end):
+        return (end - start).total_seconds() * 1000 if start and end else None
+
+    return {
+        "job_id": prediction.prediction_id,
+        "image_id": prediction.image_id,
+        "status": prediction.status,
+        "predicted_digit": prediction.predicted_digit,
+        "model_version": prediction.model_version,
+        "error": prediction.error,
+        "queued_at": prediction.prediction_time,
+        "started_at": prediction.started_at,
+        "finished_at": prediction.finished_at,
+        "queue_ms": elapsed_ms(prediction.prediction_time, prediction.started_at),
+        "run_ms": elapsed_ms(prediction.started_at, prediction.finished_at),
+    }
+
+
+@app.post("/jobs", status_code=202)
+async def create_job(
+        request: PredictionRequest,
+        current_user: dict = Depends(get_current_user),
+        db: AsyncSession = Depends(get_db)
+):
+    """Queue a prediction and return its job id at once; poll GET /jobs/{job_id} for the result."""
+    result = await db.execute(select(ImageUpload).filter(ImageUpload.image_id == request.image_id))
+    image_upload = result.scalar_one_or_none()
+    if not image_upload or image_upload.user_id != int(current_user["sub"]):
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    if not model_registry.ready:
+        raise HTTPException(status_code=503, detail="Model not loaded")
+
+    # A job stores a single result; a file that cannot be opened fails in the job as before
+    with contextlib.suppress(OSError):
+        if await count_pages(image_upload.image_path) > 1:
+            raise HTTPException(status_code=422, detail="Multi-page image: use /predict or /predict/pages")
+
+    # Claim a queue slot before writing anything, so a full queue costs no DB work
+    try:
+        job_queue.reserve()
+    except JobQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+    try:
+        prediction = PredictionResult(image_id=image_upload.image_id, status="queued")
+        db.add(prediction)
+        await db.commit()
+    except BaseException:
+        job_queue.release()
+        await db.rollback()
+        raise
+
+    job_queue.submit(
+        Job(prediction.prediction_id, image_upload.image_path, image_upload.content_hash, image_upload.user_id)
+    )
+    return _job_response(prediction)
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(
+        job_id: int,
+        wait: float = 0,
+        current_user: dict = Depends(get_current_user),
+        db: AsyncSession = Depends(get_db)
+):
+    """Return a job's state; wait > 0 long-polls up to JOB_MAX_WAIT seconds for it to finish."""
+    result = await db.execute(
+        select(PredictionResult)
+        .join(ImageUpload, PredictionResult.image_id == ImageUpload.image_id)
+        .where(PredictionResult.prediction_id == job_id, ImageUpload.user_id == int(current_user["sub"]))
+    )
+    prediction = result.scalar_one_or_none()
+    if prediction is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    # Release the connection before and between polls so waiting clients don't hold the pool
+    await db.commit()
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + min(max(wait, 0.0), Config.JOB_MAX_WAIT)
+    while prediction.status in PENDING_STATUSES and loop.time() < deadline:
+        await job_queue.wait(job_id, deadline - loop.time())
+        await db.refresh(prediction)
+        await db.commit()
+
+    return _job_response(prediction)
+
+
 if __name__ == "__main__":
+    import uvicorn
+
     uvicorn.run(
         "main:app",
         host="127.0.0.1",
         port=8000,
-        log_level="critical",  # Only show critical logs
-        access_log=False  # Disable request/response logs
+        log_level=Config.LOG_LEVEL.lower(),
+        access_log=False  # Request counts and latencies are on /metrics
     )
@@ -0,0 +1,229 @@
+import asyncio
+import logging
+import math
+import time
+from datetime import datetime, timedelta
+from typing import NamedTuple, Optional
+
+from sqlalchemy import update
+
+from app.config import Config
+from app.db import main as db_main
+from app.db.models import PredictionResult
+from app.metrics import stage_timer
+
+logger = logging.getLogger(__name__)
+
+PENDING_STATUSES = ("queued", "running")
+
+
+class Job(NamedTuple):
+    job_id: int  # PredictionResult.prediction_id
+    image_path: str
+    content_hash: Optional[str]
+    user_id: int
+
+
+class JobQueueFull(Exception):
+    def __init__(self, retry_after):
+        super().__init__("Prediction queue is full")
+        self.retry_after = retry_after
+
+
+class JobQueue:
+    """Bounded in-process queue feeding a fixed number of prediction workers.
+
+    Callers reserve() a slot before inserting the job's PredictionResult row and submit()
+    it after the commit, so a full queue is refused with JobQueueFull instead of piling
+    up coroutines. Each state change (queued -> running -> done/failed) and its timestamp
+    is written to the job's row; waiters in this process are woken when a job finishes.
+    """
+
+    def __init__(self, max_size=None, workers=None):
+        self.max_size = max_size or Config.JOB_QUEUE_SIZE
+        self.worker_count = workers or Config.JOB_WORKERS
+        self._queue = None
+        self._workers = []
+        self._reserved = 0
+        self._events = {}
+        self._active = set()
+        self._runner = None
+        self._sweeper = None
+
+        # Stats
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.abandoned = 0
+        self.avg_run_seconds = 0.0
+
+    @property
+    def depth(self):
+        return (self._queue.qsize() if self._queue is not None else 0) + self._reserved
+
+    def start(self, runner):
+        """runner(job) -> (predicted_digit, model_version) does the actual recognition."""
+        if self._workers:
+            return
+        self._runner = runner
+        self._queue = asyncio.Queue()
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.worker_count)]
+        if Config.JOB_STALE_AFTER > 0:
+            self._sweeper = asyncio.create_task(self._sweep())
+
+    async def stop(self):
+        # Jobs nobody will finish are failed rather than left queued or running forever
+        abandoned = list(self._active)
+        tasks = [*self._workers, self._sweeper] if self._sweeper is not None else self._workers
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers = []
+        self._sweeper = None
+
+        while self._queue is not None and not self._queue.empty():
+            abandoned.append(self._queue.get_nowait().job_id)
+        if abandoned:
+            await self._update(abandoned, status="failed", error="Server shut down", finished_at=datetime.utcnow())
+        for event in self._events.values():
+            event.set()
+        self._events.clear()
+
+    def retry_after(self):
+        """Seconds until a slot is likely to free up, from the average job duration."""
+        backlog = self.depth / max(self.worker_count, 1)
+        return max(1, math.ceil(backlog * (self.avg_run_seconds or 1.0)))
+
+    def reserve(self):
+        if not self._workers:
+            raise RuntimeError("Job queue is not running")
+        if self.depth >= self.max_size:
+            self.rejected += 1
+            raise JobQueueFull(self.retry_after())
+        self._reserved += 1
+
+    def release(self):
+        self._reserved -= 1
+
+    def submit(self, job: Job):
+        """Enqueue a job whose slot was reserved and whose row is committed."""
+        self._reserved -= 1
+        self._events[job.job_id] = asyncio.Event()
+        self._queue.put_nowait(job)
+        self.submitted += 1
+
+    async def wait(self, job_id, timeout):
+        """Wait up to timeout seconds for a job of this process to finish.
+
+        Jobs queued by another API process have no local event; the call then sleeps for
+        at most JOB_POLL_INTERVAL so the caller can re-read the row, which keeps
+        long-polling working across workers.
+        """
+        event = self._events.get(job_id)
+        if event is None:
+            await asyncio.sleep(min(timeout, Config.JOB_POLL_INTERVAL))
+            return
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _update(self, job_ids, **values):
+        with stage_timer("db_write"):
+            async with db_main.AsyncSessionLocal() as session:
+                await session.execute(
+                    update(PredictionResult).where(PredictionResult.prediction_id.in_(job_ids)).values(**values)
+                )
+                await session.commit()
+
+    async def fail_stale(self):
+        """Fail pending jobs queued more than JOB_STALE_AFTER seconds ago that this process doesn't hold.
+
+        A crashed or killed process never reaches stop(), so its rows would stay queued or
+        running and GET /jobs/{id} would poll them forever. Other live API processes may
+        share the table, which is why only rows older than the cutoff are failed rather
+        than every pending row. Returns the number of rows failed.
+        """
+        now = datetime.utcnow()
+        statement = (
+            update(PredictionResult)
+            .where(
+                PredictionResult.status.in_(PENDING_STATUSES),
+                PredictionResult.prediction_time < now - timedelta(seconds=Config.JOB_STALE_AFTER),
+            )
+            .values(status="failed", error="Abandoned by a server that stopped", finished_at=now)
+        )
+        owned = self._active | self._events.keys()
+        if owned:
+            statement = statement.where(PredictionResult.prediction_id.not_in(owned))
+
+        with stage_timer("db_write"):
+            async with db_main.AsyncSessionLocal() as session:
+                result = await session.execute(statement)
+                await session.commit()
+        if result.rowcount:
+            self.abandoned += result.rowcount
+            logger.warning("Failed %s prediction jobs abandoned by a stopped server", result.rowcount)
+        return result.rowcount
+
+    async def _sweep(self):
+        # First pass at startup, then often enough that a crash is noticed within ~1.5x the cutoff
+        while True:
+            try:
+                await self.fail_stale()
+            except Exception:
+                logger.exception("Could not fail stale prediction jobs")
+            await asyncio.sleep(Config.JOB_STALE_AFTER / 2)
+
+    async def _work(self):
+        while True:
+            job = await self._queue.get()
+            self._active.add(job.job_id)
+            start = time.perf_counter()
+            try:
+                await self._update([job.job_id], status="running", started_at=datetime.utcnow())
+                digits, model_version = await self._runner(job)
+                await self._update(
+                    [job.job_id],
+                    status="done",
+                    predicted_digit=digits,
+                    model_version=model_version,
+                    finished_at=datetime.utcnow(),
+                )
+                self.completed += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failed += 1
+                logger.warning("Prediction job %s failed: %s", job.job_id, e)
+                try:
+                    await self._update([job.job_id], status="failed", error=str(e), finished_at=datetime.utcnow())
+                except Exception:
+                    logger.exception("Could not record the failure of job %s", job.job_id)
+            finally:
+                # Exponential moving average feeds Retry-After
+                elapsed = time.perf_counter() - start
+                self.avg_run_seconds = elapsed if not self.avg_run_seconds else 0.8 * self.avg_run_seconds + 0.2 * elapsed
+                self._active.discard(job.job_id)
+                event = self._events.pop(job.job_id, None)
+                if event is not None:
+                    event.set()
+                self._queue.task_done()
+
+    def stats(self):
+        return {
+            "running": bool(self._workers),
+            "workers": self.worker_count,
+            "depth": self.depth,
+            "max_size": self.max_size,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "abandoned": self.abandoned,
+            "avg_run_ms": self.avg_run_seconds * 1000,
+        }
+
+
+job_queue = JobQueue()
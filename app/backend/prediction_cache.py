@@ -0,0 +1,136 @@
+import sys
+from collections import OrderedDict
+
+from sqlalchemy.future import select
+
+from app.config import Config
+from app.db.models import ImageUpload, PredictionResult
+
+
+class PredictionCache:
+    """In-process LRU of (content_hash, model_version) -> predicted digits, in front of the DB.
+
+    content_hash is the SHA-256 of the upload bytes, computed by uploads.save_upload. Rows
+    of single pages of a multi-page upload are never served, as they describe one page only.
+    """
+
+    def __init__(self, max_bytes=None):
+        self.max_bytes = Config.PREDICTION_CACHE_BYTES if max_bytes is None else max_bytes
+        self._entries = OrderedDict()
+        self.size_bytes = 0
+
+        self.hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _entry_size(key, value):
+        return sys.getsizeof(key[0]) + sys.getsizeof(key[1]) + sys.getsizeof(value)
+
+    def get(self, key):
+        value = self._entries.get(key)
+        if value is not None:
+            self._entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        if self.max_bytes <= 0:
+            return
+        if key in self._entries:
+            self.size_bytes -= self._entry_size(key, self._entries.pop(key))
+
+        self._entries[key] = value
+        self.size_bytes += self._entry_size(key, value)
+
+        while self.size_bytes > self.max_bytes and self._entries:
+            old_key, old_value = self._entries.popitem(last=False)
+            self.size_bytes -= self._entry_size(old_key, old_value)
+            self.evictions += 1
+
+    async def lookup(self, db, digest, model_version):
+        """Return the digits predicted earlier for identical content and model, or None."""
+        if not digest or not model_version:
+            return None
+
+        key = (digest, model_version)
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        result = await db.execute(
+            select(PredictionResult.predicted_digit)
+            .join(ImageUpload, PredictionResult.image_id == ImageUpload.image_id)
+            .where(
+                ImageUpload.content_hash == digest,
+                PredictionResult.model_version == model_version,
+                PredictionResult.predicted_digit.is_not(None),
+                PredictionResult.page.is_(None),
+            )
+            .order_by(PredictionResult.prediction_time.desc())
+            .limit(1)
+        )
+        value = result.scalar_one_or_none()
+        if value is None:
+            self.misses += 1
+            return None
+
+        self.db_hits += 1
+        self.put(key, value)
+        return value
+
+    async def lookup_many(self, db, digests, model_version):
+        """Batch form of lookup: {digest: digits} for every digest already recognized by the model.
+
+        Memory misses are resolved with a single IN query.
+        """
+        found = {}
+        if not model_version:
+            return found
+
+        missing = []
+        for digest in set(filter(None, digests)):
+            value = self.get((digest, model_version))
+            if value is not None:
+                found[digest] = value
+                self.hits += 1
+            else:
+                missing.append(digest)
+
+        if missing:
+            result = await db.execute(
+                select(ImageUpload.content_hash, PredictionResult.predicted_digit)
+                .join(ImageUpload, PredictionResult.image_id == ImageUpload.image_id)
+                .where(
+                    ImageUpload.content_hash.in_(missing),
+                    PredictionResult.model_version == model_version,
+                    PredictionResult.predicted_digit.is_not(None),
+                    PredictionResult.page.is_(None),
+                )
+                .order_by(PredictionResult.prediction_time)
+            )
+            from_db = {digest: value for digest, value in result}  # Ascending order: latest row wins
+            for digest, value in from_db.items():
+                found[digest] = value
+                self.put((digest, model_version), value)
+            self.db_hits += len(from_db)
+            self.misses += len(missing) - len(from_db)
+
+        return found
+
+    def stats(self):
+        lookups = self.hits + self.db_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "size_bytes": self.size_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": (self.hits + self.db_hits) / lookups if lookups else 0.0,
+        }
+
+
+prediction_cache = PredictionCache()
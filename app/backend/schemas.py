@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 from pydantic import BaseModel, EmailStr
 
@@ -37,3 +37,8 @@ class PredictionResultResponse(BaseModel):
 # Added PredictionRequest model here
 class PredictionRequest(BaseModel):
     image_id: int
+
+
+# Bulk prediction over already uploaded images
+class BulkPredictionRequest(BaseModel):
+    image_ids: List[int]
@@ -0,0 +1,158 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import Depends, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from passlib.context import CryptContext
+
+from app.config import Config
+
+# Pinning min/max rounds to the configured cost makes passlib flag hashes made with any
+# other cost as needing an update, so they get rehashed on the next successful login
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=Config.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=Config.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=Config.BCRYPT_ROUNDS,
+)
+
+# bcrypt releases the GIL, so a small dedicated pool keeps hashing off the event loop
+# without letting a burst of logins starve the pipeline executor of cores
+_hash_executor = None
+
+
+def _executor():
+    global _hash_executor
+    if _hash_executor is None:
+        _hash_executor = ThreadPoolExecutor(
+            max_workers=Config.PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash"
+        )
+    return _hash_executor
+
+
+async def _run(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(_executor(), fn, *args)
+
+
+async def hash_password(password: str):
+    return await _run(pwd_context.hash, password)
+
+
+async def verify_password(plain_password, hashed_password):
+    return await _run(pwd_context.verify, plain_password, hashed_password)
+
+
+async def verify_and_update_password(plain_password, hashed_password):
+    """Return (valid, new_hash); new_hash is set when the stored hash uses an outdated cost."""
+    return await _run(pwd_context.verify_and_update, plain_password, hashed_password)
+
+
+def shutdown_hash_executor():
+    global _hash_executor
+    if _hash_executor is not None:
+        _hash_executor.shutdown(wait=False, cancel_futures=True)
+        _hash_executor = None
+
+
+# Access tokens: compact HS256 JWTs signed with Config.SECRET_KEY, so validating one
+# needs neither a DB query nor bcrypt
+_TOKEN_HEADER = {"alg": "HS256", "typ": "JWT"}
+
+
+def _b64encode(data: bytes):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(data: str):
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _sign(signing_input: bytes):
+    return hmac.new(Config.SECRET_KEY.encode(), signing_input, hashlib.sha256).digest()
+
+
+def create_access_token(user_id: int, user_email: str, ttl=None):
+    now = int(time.time())
+    claims = {
+        "sub": str(user_id),
+        "email": user_email,
+        "iat": now,
+        "exp": now + (Config.ACCESS_TOKEN_TTL if ttl is None else ttl),
+    }
+    signing_input = ".".join(
+        _b64encode(json.dumps(part, separators=(",", ":")).encode()) for part in (_TOKEN_HEADER, claims)
+    )
+    return f"{signing_input}.{_b64encode(_sign(signing_input.encode()))}"
+
+
+class InvalidToken(Exception):
+    pass
+
+
+def decode_access_token(token: str):
+    """Verify the signature and expiry of a token and return its claims."""
+    try:
+        header, payload, signature = token.split(".")
+        expected = _sign(f"{header}.{payload}".encode())
+        if not hmac.compare_digest(expected, _b64decode(signature)):
+            raise InvalidToken("Invalid token signature")
+        if json.loads(_b64decode(header)).get("alg") != "HS256":
+            raise InvalidToken("Unsupported token algorithm")
+        claims = json.loads(_b64decode(payload))
+        expired = float(claims["exp"]) <= time.time()
+    except InvalidToken:
+        raise
+    except (ValueError, TypeError, KeyError) as e:
+        raise InvalidToken("Malformed token") from e
+
+    if expired:
+        raise InvalidToken("Token expired")
+    return claims
+
+
+class TokenCache:
+    """Small TTL + LRU cache of validated claims, keyed by the raw token."""
+
+    def __init__(self, max_entries=None, ttl=None):
+        self.max_entries = Config.TOKEN_CACHE_SIZE if max_entries is None else max_entries
+        self.ttl = Config.TOKEN_CACHE_TTL if ttl is None else ttl
+        self._entries = OrderedDict()
+
+    def validate(self, token: str):
+        now = time.time()
+        entry = self._entries.get(token)
+        if entry is not None:
+            claims, expires_at = entry
+            if expires_at > now:
+                self._entries.move_to_end(token)
+                return claims
+            del self._entries[token]
+
+        claims = decode_access_token(token)
+        if self.max_entries > 0:
+            # Never keep claims past the token's own expiry
+            self._entries[token] = (claims, min(claims["exp"], now + self.ttl))
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return claims
+
+
+token_cache = TokenCache()
+_bearer = HTTPBearer(auto_error=False)
+
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(_bearer)):
+    """FastAPI dependency returning the validated token claims ({"sub", "email", ...})."""
+    if credentials is None:
+        raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+    try:
+        return token_cache.validate(credentials.credentials)
+    except InvalidToken as e:
+        raise HTTPException(status_code=401, detail=str(e), headers={"WWW-Authenticate": "Bearer"})
@@ -0,0 +1,118 @@
+import contextlib
+import hashlib
+import os
+from typing import NamedTuple, Optional
+
+import aiofiles
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+
+from app.config import Config
+from app.image_processing.headers import ImageSniffer, decode_pixel_limit
+
+# Slack for multipart boundaries and part headers when checking Content-Length
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+class StoredUpload(NamedTuple):
+    path: str
+    size_bytes: int
+    content_hash: str
+    format: str
+    width: Optional[int]
+    height: Optional[int]
+    content: Optional[bytearray] = None
+
+
+def _too_large(max_bytes):
+    return HTTPException(status_code=413, detail=f"Upload exceeds the {max_bytes} byte limit")
+
+
+def _check_pixels(sniffer):
+    """413 for an image too large to accept, or to decode within IMAGE_PIXEL_BUDGET."""
+    pixels = sniffer.width * sniffer.height
+    if pixels > Config.MAX_IMAGE_PIXELS:
+        raise HTTPException(status_code=413, detail=f"Image exceeds {Config.MAX_IMAGE_PIXELS} pixels")
+    limit = decode_pixel_limit(sniffer.format, Config.IMAGE_PIXEL_BUDGET)
+    if pixels > limit:
+        detail = f"{sniffer.format.upper()} images are limited to {limit} pixels"
+        if sniffer.format != "jpeg":
+            detail += "; send larger scans as JPEG"
+        raise HTTPException(status_code=413, detail=detail)
+
+
+async def save_upload(upload: UploadFile, destination, max_bytes=None, chunk_size=None, keep_content=False):
+    """Stream an upload to destination in fixed-size chunks.
+
+    A single pass writes the file, enforces max_bytes (413), sniffs the image header
+    (415 for anything that is not a supported image, 413 above MAX_IMAGE_PIXELS or above
+    what can be decoded within IMAGE_PIXEL_BUDGET) and computes the SHA-256 used as the
+    prediction cache key. Partially written files are removed on failure.
+
+    keep_content also collects the bytes (at most max_bytes) so the caller can decode
+    them without reading the file back.
+    """
+    max_bytes = Config.MAX_UPLOAD_BYTES if max_bytes is None else max_bytes
+    chunk_size = chunk_size or Config.UPLOAD_CHUNK_BYTES
+
+    # The multipart parser already knows the part size; refuse before copying anything
+    if upload.size is not None and upload.size > max_bytes:
+        raise _too_large(max_bytes)
+
+    digest = hashlib.sha256()
+    sniffer = ImageSniffer()
+    content = bytearray() if keep_content else None
+    size = 0
+    try:
+        async with aiofiles.open(destination, "wb") as out:
+            while chunk := await upload.read(chunk_size):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise _too_large(max_bytes)
+                sniffer.feed(chunk)
+                if sniffer.rejected:
+                    raise HTTPException(status_code=415, detail="Unsupported image format")
+                if sniffer.width is not None:
+                    _check_pixels(sniffer)
+                digest.update(chunk)
+                if content is not None:
+                    content += chunk
+                await out.write(chunk)
+
+        if sniffer.format is None:
+            raise HTTPException(status_code=415, detail="Unsupported image format")
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(destination)
+        raise
+
+    return StoredUpload(
+        destination,
+        size,
+        digest.hexdigest(),
+        sniffer.format,
+        sniffer.width,
+        sniffer.height,
+        content,
+    )
+
+
+class UploadSizeLimitMiddleware:
+    """Answer 413 from the Content-Length header, before the multipart body is read.
+
+    Chunked requests without a Content-Length fall through to save_upload's own check.
+    """
+
+    def __init__(self, app, paths, max_bytes=None):
+        self.app = app
+        self.paths = frozenset(paths)
+        self.max_bytes = Config.MAX_UPLOAD_BYTES if max_bytes is None else max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] in self.paths:
+            length = dict(scope["headers"]).get(b"content-length", b"")
+            if length.isdigit() and int(length) > self.max_bytes + MULTIPART_OVERHEAD:
+                response = JSONResponse(status_code=413, content={"detail": _too_large(self.max_bytes).detail})
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
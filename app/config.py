@@ -1,4 +1,5 @@
 import os
+import secrets
 
 from dotenv import load_dotenv
 
@@ -9,6 +10,12 @@ load_dotenv()
 class Config:
     # Database Configuration
     DATABASE_URL = os.getenv("DATABASE_URL")
+    DB_ECHO = os.getenv("DB_ECHO", "false").lower() == "true"  # Log every SQL statement
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+    DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))  # Seconds to wait for a free connection
+    DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))  # Seconds before a connection is replaced
+    DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
 
     # API Base URL
     BASE_URL = os.getenv("BASE_URL", "http://localhost:8000")
@@ -16,23 +23,70 @@ class Config:
     # File Storage Paths
     UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
     TEMP_FOLDERS_PATH = os.getenv("TEMP_FOLDERS_PATH", "temp_folders")
+    SCRATCH_DIR = os.getenv("SCRATCH_DIR", TEMP_FOLDERS_PATH)  # Per-request workspaces; e.g. /dev/shm for tmpfs
+    MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", 20 * 1024 * 1024))  # Larger uploads get 413
+    UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", 1024 * 1024))  # Read/write size when streaming uploads
+    MAX_IMAGE_PIXELS = int(os.getenv("MAX_IMAGE_PIXELS", 256_000_000))  # Larger images get 413, read from the header
+
+    # Password Hashing
+    BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))  # Cost factor; stored hashes are upgraded on login
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 2))  # Concurrent bcrypt operations
+
+    # Access Tokens
+    # Must be shared by every worker; the random fallback only suits a single dev process
+    SECRET_KEY = os.getenv("SECRET_KEY") or secrets.token_urlsafe(32)
+    ACCESS_TOKEN_TTL = int(os.getenv("ACCESS_TOKEN_TTL", 3600))  # Seconds a token from /login stays valid
+    TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", 1024))  # Validated tokens kept in memory
+    TOKEN_CACHE_TTL = int(os.getenv("TOKEN_CACHE_TTL", 60))  # Seconds before a cached token is re-verified
 
     # Logging Level
     LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")  # (NEW) Logging level from environment
 
+    # Profiling (see app/profiling.py); off unless one of the first two is set
+    PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", 0))  # Share of prediction requests traced
+    PROFILE_HEADER_ENABLED = os.getenv("PROFILE_HEADER_ENABLED", "false").lower() == "true"  # Honor X-Profile
+    PROFILE_SAMPLE_MODE = os.getenv("PROFILE_SAMPLE_MODE", "spans")  # spans, cprofile or torch for sampled requests
+    PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+
     # Model Path (New)
     MODEL_PATH = os.getenv("MODEL_PATH", "fine_tuned_resnet_mnist.pth")  # (NEW) Model path from environment
+    CLASSIFIER_MODE = os.getenv("CLASSIFIER_MODE", "resnet")  # "resnet" (224x224 RGB) or "compact" (28x28 gray)
+    INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "eager")  # eager, torchscript, int8-dynamic or onnxruntime
+    MODEL_RELOAD_INTERVAL = float(os.getenv("MODEL_RELOAD_INTERVAL", 30))  # Seconds between checkpoint checks, 0 disables
+
+    # Inference Configurations
+    MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", 64))  # Maximum crops per forward pass
+    SCHEDULER_MAX_WAIT_MS = float(os.getenv("SCHEDULER_MAX_WAIT_MS", 5))  # Window to gather crops across requests
+    PIPELINE_EXECUTOR = os.getenv("PIPELINE_EXECUTOR", "thread")  # "thread" or "process"
+    PIPELINE_WORKERS = int(os.getenv("PIPELINE_WORKERS", os.cpu_count() or 1))  # Pool size for the pipeline executor
+    TORCH_THREADS = int(os.getenv("TORCH_THREADS", 0))  # Intra-op threads per worker, 0 picks a default
+
+    # Bulk Prediction
+    BULK_PREDICT_MAX = int(os.getenv("BULK_PREDICT_MAX", 1000))  # image_ids accepted per /predict/bulk request
+    BULK_CHUNK_IMAGES = int(os.getenv("BULK_CHUNK_IMAGES", 32))  # Images segmented and classified together
+
+    # Prediction Jobs
+    JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", 100))  # Queued jobs before POST /jobs answers 429
+    JOB_WORKERS = int(os.getenv("JOB_WORKERS", os.cpu_count() or 1))  # Jobs recognized concurrently
+    JOB_MAX_WAIT = float(os.getenv("JOB_MAX_WAIT", 30))  # Longest long-poll accepted by GET /jobs/{id}
+    JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", 0.5))  # Re-read interval for jobs of other processes
+    JOB_STALE_AFTER = float(os.getenv("JOB_STALE_AFTER", 600))  # Seconds before an unfinished job left by a dead process is failed, 0 disables
+
+    # Prediction Cache
+    PREDICTION_CACHE_BYTES = int(os.getenv("PREDICTION_CACHE_BYTES", 16 * 1024 * 1024))  # In-process LRU budget, 0 disables
 
     # Segmentation Configurations
     LINE_THRESHOLD = int(os.getenv("LINE_THRESHOLD", 20))  # (NEW) Configurable line height threshold
     MIN_SEGMENT_HEIGHT = int(os.getenv("MIN_SEGMENT_HEIGHT", 10))  # (NEW) Configurable minimum segment height
+    IMAGE_PIXEL_BUDGET = int(os.getenv("IMAGE_PIXEL_BUDGET", 16_000_000))  # Larger JPEGs decode reduced, others get 413
+    ANALYSIS_MAX_PIXELS = int(os.getenv("ANALYSIS_MAX_PIXELS", 2_000_000))  # Size of the copy lines are detected on
+    CROP_PADDING = float(os.getenv("CROP_PADDING", 4 / 28))  # Margin around a digit, share of the input side
+    DEBUG_SAVE_SEGMENTS = os.getenv("DEBUG_SAVE_SEGMENTS", "false").lower() == "true"  # Keep crops in a per-request workspace
 
     @staticmethod
     def ensure_directories():
         """Ensure required directories exist."""
         os.makedirs(Config.UPLOAD_DIR, exist_ok=True)
         os.makedirs(Config.TEMP_FOLDERS_PATH, exist_ok=True)
+        os.makedirs(Config.SCRATCH_DIR, exist_ok=True)
 
-
-# Ensure necessary directories exist
-Config.ensure_directories()
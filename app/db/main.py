@@ -1,19 +1,120 @@
+import logging
+import time
+
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from app.config import Config
 
-# Database configuration (Async)
-async_engine = create_async_engine(url=Config.DATABASE_URL, echo=True, future=True)
-AsyncSessionLocal = sessionmaker(
-    bind=async_engine,
-    class_=AsyncSession,
-    expire_on_commit=False
-)
+
+class PoolMetrics:
+    """Connection pool checkout counts and wait times."""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.wait_seconds_total = 0.0
+        self.max_wait_seconds = 0.0
+        self.timeouts = 0
+
+    def record_wait(self, seconds, timed_out=False):
+        self.checkouts += 1
+        self.wait_seconds_total += seconds
+        self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+        self.timeouts += timed_out
+
+
+pool_metrics = PoolMetrics()
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long each checkout waited for a connection."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        timed_out = False
+        try:
+            return super()._do_get()
+        except Exception:
+            timed_out = True
+            raise
+        finally:
+            pool_metrics.record_wait(time.perf_counter() - start, timed_out)
+
+
+# SQLAlchemy names pool loggers after the class, so this subclass would escape the
+# WARNING level that SQLAlchemy gives its own "sqlalchemy" logger tree
+logging.getLogger(f"{__name__}.{TimedQueuePool.__name__}").setLevel(logging.WARNING)
+
+
+# Created by init_engine() from the FastAPI lifespan, never at import time
+async_engine = None
+AsyncSessionLocal = None
+
+
+def init_engine():
+    """Create the async engine and session factory (idempotent)."""
+    global async_engine, AsyncSessionLocal
+    if async_engine is not None:
+        return async_engine
+
+    url = make_url(Config.DATABASE_URL)
+    options = {"echo": Config.DB_ECHO, "future": True}
+    if url.get_backend_name() == "sqlite":
+        # File databases for local runs and load tests; in-memory ones keep SQLAlchemy's default pool
+        if url.database not in (None, "", ":memory:"):
+            options.update(poolclass=TimedQueuePool, pool_pre_ping=Config.DB_POOL_PRE_PING)
+    else:
+        options.update(
+            poolclass=TimedQueuePool,
+            pool_size=Config.DB_POOL_SIZE,
+            max_overflow=Config.DB_MAX_OVERFLOW,
+            pool_timeout=Config.DB_POOL_TIMEOUT,
+            pool_recycle=Config.DB_POOL_RECYCLE,
+            pool_pre_ping=Config.DB_POOL_PRE_PING,
+        )
+
+    async_engine = create_async_engine(url, **options)
+    AsyncSessionLocal = sessionmaker(
+        bind=async_engine,
+        class_=AsyncSession,
+        expire_on_commit=False
+    )
+    return async_engine
+
+
+async def dispose_engine():
+    global async_engine, AsyncSessionLocal
+    if async_engine is not None:
+        await async_engine.dispose()
+    async_engine = None
+    AsyncSessionLocal = None
+
+
+def pool_stats():
+    stats = {
+        "checkouts": pool_metrics.checkouts,
+        "wait_seconds_total": pool_metrics.wait_seconds_total,
+        "avg_wait_ms": pool_metrics.wait_seconds_total * 1000 / pool_metrics.checkouts if pool_metrics.checkouts else 0.0,
+        "max_wait_ms": pool_metrics.max_wait_seconds * 1000,
+        "timeouts": pool_metrics.timeouts,
+    }
+    pool = async_engine.sync_engine.pool if async_engine is not None else None
+    if isinstance(pool, AsyncAdaptedQueuePool):
+        stats.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            overflow=pool.overflow(),
+        )
+    return stats
 
 
 # Dependency to get the async DB session
 async def get_db():
+    if AsyncSessionLocal is None:
+        init_engine()
     async with AsyncSessionLocal() as db:
         yield db
         await db.commit()
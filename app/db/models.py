@@ -1,11 +1,8 @@
 from datetime import datetime
 from typing import List, Optional
 
-from sqlalchemy import create_engine
 from sqlmodel import Field, SQLModel, Relationship
 
-from app.config import Config
-
 
 # Users Table
 class User(SQLModel, table=True):
@@ -26,6 +23,7 @@ class ImageUpload(SQLModel, table=True):
     image_id: int = Field(default=None, primary_key=True, index=True)
     user_id: int = Field(foreign_key="users.user_id")
     image_path: str = Field(nullable=False, index=True)
+    content_hash: Optional[str] = Field(default=None, max_length=64, index=True, nullable=True)
     # noinspection PyDeprecation
     upload_time: datetime = Field(default_factory=datetime.utcnow, nullable=False)
 
@@ -40,21 +38,15 @@ class PredictionResult(SQLModel, table=True):
 
     prediction_id: int = Field(default=None, primary_key=True, index=True)
     image_id: int = Field(foreign_key="image_uploads.image_id")
-    predicted_digit: str = Field(nullable=False)
+    page: Optional[int] = Field(default=None, nullable=True)  # 1-based page of a multi-page upload, else None
+    predicted_digit: Optional[str] = Field(default=None, nullable=True)  # None until a job finishes
     confidence_score: Optional[float] = Field(default=None, nullable=True)
+    model_version: Optional[str] = Field(default=None, max_length=64, nullable=True)
     prediction_time: datetime = Field(default_factory=datetime.utcnow, nullable=False)
+    # Job state: synchronous predictions are stored as "done"; jobs go queued -> running -> done/failed
+    status: str = Field(default="done", max_length=16, nullable=False, sa_column_kwargs={"server_default": "done"})
+    error: Optional[str] = Field(default=None, nullable=True)
+    started_at: Optional[datetime] = Field(default=None, nullable=True)
+    finished_at: Optional[datetime] = Field(default=None, nullable=True)
     image_upload: Optional[ImageUpload] = Relationship(back_populates="predictions")
 
-
-# Use a synchronous engine for table creation
-sync_engine = create_engine(Config.DATABASE_URL.replace("postgresql+asyncpg", "postgresql"))
-
-
-# Create tables if they do not exist
-def init_db():
-    """Initialize the database."""
-    SQLModel.metadata.create_all(sync_engine)
-
-
-# Call the function to ensure tables are created at startup
-init_db()
@@ -1,6 +1,5 @@
 import logging
 import os
-import shutil
 import sys
 
 import requests
@@ -13,24 +12,6 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 from config import Config
 
 
-def clear_temp_folders():
-    # Define the path to the temp_folders directory
-    temp_folders_path = Config.TEMP_FOLDERS_PATH
-
-    # Check if the temp_folders directory exists
-    if os.path.exists(temp_folders_path):
-        # Iterate over each subfolder inside temp_folders
-        for folder_name in os.listdir(temp_folders_path):
-            folder_path = os.path.join(temp_folders_path, folder_name)
-
-            # Ensure it's a directory
-            if os.path.isdir(folder_path):
-                shutil.rmtree(folder_path)  # Recursively delete the folder and its contents
-
-    else:
-        pass
-
-
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger()
 # API URLs for login, signup, and image upload
@@ -61,6 +42,7 @@ def login(email, password):
         st.session_state.logged_in = True
         st.session_state.user_email = email
         st.session_state.user_id = response.json().get("user_id")
+        st.session_state.access_token = response.json().get("access_token")
         st.session_state.page = "upload"
 
         st.session_state.page_refreshed = True
@@ -93,6 +75,10 @@ def login_signup_page():
                 st.warning("Please fill out all fields.")
 
 
+def auth_headers():
+    return {"Authorization": f"Bearer {st.session_state.access_token}"}
+
+
 def image_upload_page():
     st.title(f"Welcome, {st.session_state.user_email}")
     st.subheader("Upload an Image for Prediction")
@@ -108,24 +94,20 @@ def image_upload_page():
     if image:
         st.image(image, caption="Uploaded Image", use_container_width=True)
 
-        # Auto-upload image
+        # Upload and predict in a single request
         files = {"image": ("image.jpg", image.getvalue(), image.type)}
         response = requests.post(
-            f"{BASE_URL}/upload_image",
-            data={"user_id": str(st.session_state.user_id)},
+            f"{BASE_URL}/recognize",
+            headers=auth_headers(),
             files=files
         )
 
         if response.status_code == 200:
-            st.success("Image uploaded successfully!")
-            image_id = response.json().get("image_id")
-            st.session_state.image_id = image_id
-            st.session_state.predicted_digit = None  # Ensure no previous prediction result is shown
-
-            # Trigger prediction after upload
-            predict_result()
+            result = response.json()
+            st.session_state.image_id = result["image_id"]
+            st.session_state.predicted_digit = result["predicted_digit"]
         else:
-            st.error("Error uploading the image.")
+            st.error("Error recognizing the image.")
 
     if "predicted_digit" in st.session_state and st.session_state.predicted_digit is not None:
         st.subheader("Prediction Result :")
@@ -134,26 +116,6 @@ def image_upload_page():
             st.write(line)
 
 
-def predict_result():
-    if "image_id" not in st.session_state:
-        return
-
-    response = requests.post(
-        f"{BASE_URL}/predict",
-        json={"image_id": st.session_state.image_id}
-    )
-
-    if response.status_code == 200:
-        result = response.json()
-        st.session_state.predicted_digit = result["predicted_digit"]
-
-        clear_temp_folders()
-
-
-    else:
-        st.error("Error predicting the result.")
-
-
 def main():
     if 'logged_in' in st.session_state and st.session_state.logged_in:
         image_upload_page()
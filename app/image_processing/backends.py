@@ -0,0 +1,98 @@
+import os
+
+import torch
+
+INFERENCE_BACKENDS = ("eager", "torchscript", "int8-dynamic", "onnxruntime")
+
+# Suffix of the exported artefact written next to Config.MODEL_PATH for each backend
+_EXPORT_SUFFIXES = {
+    "torchscript": ".torchscript.pt",
+    "int8-dynamic": ".int8.pt",
+    "onnxruntime": ".onnx",
+}
+
+
+def export_path(model_path, backend):
+    """Where export_model writes (and load_backend looks for) the artefact of a backend."""
+    if backend == "eager":
+        return model_path
+    stem, _ = os.path.splitext(model_path)
+    return stem + _EXPORT_SUFFIXES[backend]
+
+
+class OnnxClassifier:
+    """Callable wrapper so an onnxruntime session can stand in for the torch model."""
+
+    def __init__(self, path, threads=0):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise RuntimeError("INFERENCE_BACKEND=onnxruntime requires the onnxruntime package") from e
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, images):
+        output = self.session.run(None, {self.input_name: images.cpu().numpy()})[0]
+        return torch.from_numpy(output)
+
+    def eval(self):
+        return self
+
+
+def to_torchscript(model, example):
+    """Trace and freeze an eager model. The result can be saved with torch.jit.save."""
+    with torch.inference_mode():
+        scripted = torch.jit.trace(model, example)
+    return torch.jit.freeze(scripted.eval())
+
+
+def to_int8_dynamic(model):
+    """Dynamically quantize the Linear layers to int8 (weights int8, activations quantized on the fly)."""
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def to_int8_torchscript(model, example):
+    with torch.inference_mode():
+        scripted = torch.jit.trace(to_int8_dynamic(model), example)
+    return torch.jit.freeze(scripted.eval())
+
+
+def load_backend(backend, model, model_path, device, example, threads=0):
+    """Turn the eager model into the configured backend.
+
+    Uses the exported artefact when export_model has written one, otherwise converts
+    in memory (torchscript, int8-dynamic). onnxruntime always needs the exported file.
+    """
+    if backend not in INFERENCE_BACKENDS:
+        raise ValueError(f"Unknown INFERENCE_BACKEND: {backend}")
+    if backend == "eager":
+        return model
+
+    artefact = export_path(model_path, backend)
+    if backend == "onnxruntime":
+        if not os.path.exists(artefact):
+            raise FileNotFoundError(
+                f"{artefact} not found; run python -m app.image_processing.export_model first"
+            )
+        return OnnxClassifier(artefact, threads)
+
+    if device.type != "cpu":
+        # Both remaining backends target CPU-only nodes
+        return model
+
+    if backend == "torchscript":
+        if os.path.exists(artefact):
+            scripted = torch.jit.load(artefact, map_location=device).eval()
+        else:
+            scripted = to_torchscript(model, example)
+        # Conv/BN folding and MKLDNN layouts; applied after loading because the result can't be re-saved
+        return torch.jit.optimize_for_inference(scripted)
+
+    if os.path.exists(artefact):
+        return torch.jit.load(artefact, map_location=device).eval()
+    return to_int8_dynamic(model)
@@ -0,0 +1,91 @@
+import asyncio
+import contextvars
+import functools
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from app.config import Config
+from app.image_processing.model_registry import model_registry
+from app.profiling import current_trace, profiled
+
+
+def _init_process_worker(torch_threads):
+    """Preload the classifier once in each worker process."""
+    import torch
+
+    torch.set_num_threads(torch_threads)
+    model_registry.load_sync()
+
+
+def _ping():
+    return os.getpid()
+
+
+class PipelineExecutor:
+    """Runs CPU-bound pipeline stages off the asyncio event loop.
+
+    "thread" keeps one model in the API process and lets the inference scheduler batch
+    across requests; "process" preloads a model in every worker so the whole
+    decode -> segment -> classify pipeline scales across cores.
+    """
+
+    def __init__(self):
+        self.kind = None
+        self.workers = 0
+        self._pool = None
+
+    @property
+    def uses_processes(self):
+        return self.kind == "process"
+
+    def start(self, kind=None, workers=None):
+        if self._pool is not None:
+            return
+
+        kind = kind or Config.PIPELINE_EXECUTOR
+        workers = workers or Config.PIPELINE_WORKERS
+
+        if kind == "process":
+            torch_threads = Config.TORCH_THREADS or max(1, (os.cpu_count() or 1) // workers)
+            self._pool = ProcessPoolExecutor(
+                max_workers=workers,
+                # torch is not fork-safe once its thread pools are up
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_process_worker,
+                initargs=(torch_threads,),
+            )
+        elif kind == "thread":
+            if Config.TORCH_THREADS:
+                import torch
+
+                torch.set_num_threads(Config.TORCH_THREADS)
+            self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pipeline")
+        else:
+            raise ValueError(f"Unknown PIPELINE_EXECUTOR: {kind}")
+
+        self.kind = kind
+        self.workers = workers
+
+    async def warmup(self):
+        """Spawn process workers (and load their models) before the first request arrives."""
+        if self.uses_processes:
+            await asyncio.gather(*(self.run(_ping) for _ in range(self.workers)))
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+            self.kind = None
+
+    async def run(self, fn, *args, **kwargs):
+        """Run fn in the pool; falls back to the loop's default executor when not started."""
+        loop = asyncio.get_running_loop()
+        call = functools.partial(profiled(fn), *args, **kwargs)
+        if current_trace() is not None and not self.uses_processes:
+            # run_in_executor drops contextvars; carry the trace so stage spans nest under the request
+            call = functools.partial(contextvars.copy_context().run, call)
+        return await loop.run_in_executor(self._pool, call)
+
+
+pipeline_executor = PipelineExecutor()
@@ -0,0 +1,115 @@
+"""Convert the fine-tuned checkpoint into each CPU inference backend and check parity.
+
+    python -m app.image_processing.export_model
+    python -m app.image_processing.export_model --backends torchscript onnxruntime --images test_images
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+import torch
+
+from app.config import Config
+from app.image_processing.architectures import load_eager_model
+from app.image_processing.backends import (
+    INFERENCE_BACKENDS,
+    export_path,
+    load_backend,
+    to_int8_torchscript,
+    to_torchscript,
+)
+from app.image_processing.model_registry import input_shape
+from app.image_processing.predict import classify_batch, stack_crops
+from app.image_processing.segmentation import segment_with_resnet
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+
+
+def export(backend, model, model_path, example):
+    """Write the artefact for one backend next to model_path and return its path."""
+    path = export_path(model_path, backend)
+    if backend == "torchscript":
+        torch.jit.save(to_torchscript(model, example), path)
+    elif backend == "int8-dynamic":
+        torch.jit.save(to_int8_torchscript(model, example), path)
+    elif backend == "onnxruntime":
+        torch.onnx.export(
+            model,
+            example,
+            path,
+            input_names=["images"],
+            output_names=["logits"],
+            dynamic_axes={"images": {0: "batch"}, "logits": {0: "batch"}},
+            dynamo=False,
+        )
+    return path
+
+
+def load_crops(image_dir):
+    """Segment every test image and stack all crops into one tensor."""
+    batches = []
+    for image_path in sorted(Path(image_dir).iterdir()):
+        if image_path.suffix.lower() not in IMAGE_EXTENSIONS:
+            continue
+        images = stack_crops(segment_with_resnet(str(image_path)))
+        if images is not None:
+            batches.append(images)
+    return torch.cat(batches) if batches else torch.zeros(0, *input_shape())
+
+
+def timed_predictions(model, images, device, repeats):
+    classify_batch(model, images[:Config.MAX_BATCH_SIZE], device)  # Warmup
+    start = time.perf_counter()
+    for _ in range(repeats):
+        predictions = classify_batch(model, images, device)
+    return predictions, (time.perf_counter() - start) / repeats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-path", default=Config.MODEL_PATH)
+    parser.add_argument("--backends", nargs="+", default=[b for b in INFERENCE_BACKENDS if b != "eager"],
+                        choices=INFERENCE_BACKENDS)
+    parser.add_argument("--images", default="test_images", help="Folder used for the parity check")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed passes over the crops per backend")
+    parser.add_argument("--min-agreement", type=float, default=0.99,
+                        help="Fail when a backend agrees with eager on fewer than this share of crops")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.model_path):
+        parser.error(f"Checkpoint not found: {args.model_path}")
+
+    device = torch.device("cpu")
+    model = load_eager_model(args.model_path, device)
+    example = torch.zeros(1, *input_shape())
+
+    images = load_crops(args.images)
+    if images.shape[0] == 0:
+        parser.error(f"No digit crops found in {args.images}")
+
+    reference, eager_seconds = timed_predictions(model, images, device, args.repeats)
+    print(f"{images.shape[0]} crops from {args.images}")
+    print(f"{'backend':<14}{'agreement':>10}{'ms/crop':>10}{'speedup':>9}{'size MB':>9}")
+    print(f"{'eager':<14}{1:>10.2%}{eager_seconds * 1000 / images.shape[0]:>10.2f}{1:>9.2f}"
+          f"{os.path.getsize(args.model_path) / 2 ** 20:>9.1f}")
+
+    failed = False
+    for backend in args.backends:
+        if backend == "eager":
+            continue
+        path = export(backend, model, args.model_path, example)
+        candidate = load_backend(backend, model, args.model_path, device, example)
+        predictions, seconds = timed_predictions(candidate, images, device, args.repeats)
+
+        agreement = sum(a == b for a, b in zip(reference, predictions)) / len(reference)
+        failed |= agreement < args.min_agreement
+        print(f"{backend:<14}{agreement:>10.2%}{seconds * 1000 / images.shape[0]:>10.2f}"
+              f"{eager_seconds / seconds:>9.2f}{os.path.getsize(path) / 2 ** 20:>9.1f}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
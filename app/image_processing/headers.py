@@ -0,0 +1,163 @@
+"""Image format and dimensions from the first bytes of a file, without decoding pixels."""
+import struct
+
+
+def _png_size(head):
+    if len(head) >= 24 and head[12:16] == b"IHDR":
+        return struct.unpack(">II", head[16:24])
+
+
+def _jpeg_size(head):
+    # Walk the marker segments up to the first start-of-frame
+    i = 2
+    while i + 9 <= len(head):
+        if head[i] != 0xFF:
+            return None
+        marker = head[i + 1]
+        if marker == 0xFF:
+            i += 1
+        elif marker in (0x01, 0xD8) or 0xD0 <= marker <= 0xD7:
+            i += 2
+        elif 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            height, width = struct.unpack(">HH", head[i + 5:i + 9])
+            return width, height
+        else:
+            i += 2 + struct.unpack(">H", head[i + 2:i + 4])[0]
+    return None
+
+
+def _bmp_size(head):
+    if len(head) < 26:
+        return None
+    if struct.unpack("<I", head[14:18])[0] == 12:
+        return struct.unpack("<HH", head[18:22])
+    width, height = struct.unpack("<ii", head[18:26])
+    return width, abs(height)  # Negative height means a top-down bitmap
+
+
+def _tiff_size(head):
+    endian = "<" if head[:2] == b"II" else ">"
+    offset = struct.unpack(endian + "I", head[4:8])[0]
+    if offset + 2 > len(head):
+        return None
+    count = struct.unpack(endian + "H", head[offset:offset + 2])[0]
+    entries = head[offset + 2:offset + 2 + count * 12]
+    if len(entries) < count * 12:
+        return None
+
+    # ImageWidth (256) and ImageLength (257) are SHORT (type 3) or LONG values
+    tags = {}
+    for i in range(0, len(entries), 12):
+        tag, kind = struct.unpack(endian + "HH", entries[i:i + 4])
+        if tag in (256, 257):
+            value_format = endian + ("H" if kind == 3 else "I")
+            tags[tag] = struct.unpack_from(value_format, entries, i + 8)[0]
+    if 256 in tags and 257 in tags:
+        return tags[256], tags[257]
+    return None
+
+
+def _webp_size(head):
+    if len(head) < 30:
+        return None
+    chunk = head[12:16]
+    if chunk == b"VP8X":
+        return 1 + int.from_bytes(head[24:27], "little"), 1 + int.from_bytes(head[27:30], "little")
+    if chunk == b"VP8L":
+        bits = int.from_bytes(head[21:25], "little")
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b"VP8 ":
+        return int.from_bytes(head[26:28], "little") & 0x3FFF, int.from_bytes(head[28:30], "little") & 0x3FFF
+    return None
+
+
+def _detect_format(head):
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if head.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    if head.startswith(b"BM"):
+        return "bmp"
+    if head.startswith((b"II*\x00", b"MM\x00*")):
+        return "tiff"
+    if head.startswith(b"RIFF") and head[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+_SIZE_PARSERS = {"png": _png_size, "jpeg": _jpeg_size, "bmp": _bmp_size, "tiff": _tiff_size, "webp": _webp_size}
+
+# Only the JPEG decoder produces a 1/2, 1/4 or 1/8 scale image directly; every other
+# format is decoded at full size first, whatever the reduction asked for
+REDUCED_DECODE_FORMATS = frozenset({"jpeg"})
+MAX_DECODE_REDUCTION = 8
+
+
+def decode_pixel_limit(image_format, pixel_budget):
+    """Largest image, in pixels, of image_format that can be decoded within pixel_budget."""
+    if image_format in REDUCED_DECODE_FORMATS:
+        return pixel_budget * MAX_DECODE_REDUCTION ** 2
+    return pixel_budget
+
+
+class ImageSniffer:
+    """Identify an image's format and dimensions from the first bytes of a stream.
+
+    Chunks are fed as they arrive; only the first HEAD_BYTES are kept, so sniffing costs
+    no extra pass over the file. width and height stay None when the header fields lie
+    beyond HEAD_BYTES (e.g. a JPEG with a large EXIF block).
+    """
+    HEAD_BYTES = 64 * 1024
+
+    def __init__(self):
+        self._head = bytearray()
+        self.format = None
+        self.width = None
+        self.height = None
+        self.done = False
+
+    @property
+    def rejected(self):
+        return self.done and self.format is None
+
+    def feed(self, chunk: bytes):
+        if self.done:
+            return
+        self._head += chunk[:self.HEAD_BYTES - len(self._head)]
+        head = bytes(self._head)
+
+        if self.format is None:
+            if len(head) < 12:
+                return
+            self.format = _detect_format(head)
+            if self.format is None:
+                self.done = True
+                return
+
+        size = _SIZE_PARSERS[self.format](head)
+        if size is not None:
+            self.width, self.height = size
+            self.done = True
+        elif len(head) >= self.HEAD_BYTES:
+            self.done = True
+
+
+def _read_head(image_source, size):
+    if isinstance(image_source, (bytes, bytearray, memoryview)):
+        return bytes(image_source[:size])
+    with open(image_source, "rb") as f:
+        return f.read(size)
+
+
+def image_format(image_source):
+    """Format name ("png", "jpeg", "bmp", "tiff" or "webp") of a file path or encoded bytes, or None."""
+    return _detect_format(_read_head(image_source, 12))
+
+
+def image_size(image_source):
+    """(width, height) of an image file path or encoded bytes from its header, or None if unknown."""
+    sniffer = ImageSniffer()
+    sniffer.feed(_read_head(image_source, ImageSniffer.HEAD_BYTES))
+    if sniffer.width is None:
+        return None
+    return sniffer.width, sniffer.height
@@ -0,0 +1,179 @@
+import asyncio
+import hashlib
+import logging
+import os
+import time
+
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Shape of a single preprocessed crop for each CLASSIFIER_MODE
+INPUT_SHAPES = {
+    "resnet": (3, 224, 224),
+    "compact": (1, 28, 28),
+}
+
+
+def input_shape(mode=None):
+    mode = mode or Config.CLASSIFIER_MODE
+    if mode not in INPUT_SHAPES:
+        raise ValueError(f"Unknown CLASSIFIER_MODE: {mode}")
+    return INPUT_SHAPES[mode]
+
+
+def checkpoint_digest(path):
+    """SHA-256 of a checkpoint file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except FileNotFoundError:
+        return None
+
+
+class ModelRegistry:
+    """Process-wide holder for the digit classifier, shared by all requests."""
+
+    def __init__(self):
+        self.device = None
+        self.model = None
+        self.model_path = None
+        self.backend = None
+        self.mode = None
+        self.version = None
+        self.loaded_at = None
+        self.reload_error = None
+        self.reload_error_at = None
+        self._signature = None
+        self._failed_signature = None
+        self._lock = asyncio.Lock()
+        self._watcher = None
+
+    @property
+    def ready(self):
+        return self.model is not None
+
+    def _checkpoint_signature(self):
+        """Identify the configured checkpoint and backend artefact, or None if the checkpoint is missing."""
+        from app.image_processing.backends import export_path
+
+        model_path = Config.MODEL_PATH
+        backend = Config.INFERENCE_BACKEND
+        mode = Config.CLASSIFIER_MODE
+        model_mtime = _mtime(model_path)
+        if model_mtime is None:
+            return None
+        return model_path, backend, mode, model_mtime, _mtime(export_path(model_path, backend))
+
+    def _build(self, signature):
+        # torch/torchvision are imported here, during warmup, so importing the API stays cheap
+        import torch
+
+        from app.image_processing.architectures import load_eager_model
+        from app.image_processing.backends import load_backend
+
+        if self.device is None:
+            self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+
+        model_path, backend, mode = signature[:3]
+        model = load_eager_model(model_path, self.device, mode)
+        example = torch.zeros(1, *input_shape(mode), device=self.device)
+        model = load_backend(backend, model, model_path, self.device, example, Config.TORCH_THREADS)
+        # Identifies which weights and crop padding produced a prediction, e.g. for the prediction cache
+        version = f"{mode}-{backend}-{checkpoint_digest(model_path)[:16]}-pad{Config.CROP_PADDING:.3g}"
+        return model, version
+
+    def _swap(self, built, signature):
+        # Swap in one assignment so in-flight requests keep the model they already hold
+        self.model, self.version = built
+        self.model_path, self.backend, self.mode = signature[:3]
+        self._signature = signature
+        self.loaded_at = time.time()
+        self.reload_error = self.reload_error_at = self._failed_signature = None
+
+    def load_sync(self):
+        """Blocking load of Config.MODEL_PATH, used by pipeline worker processes."""
+        signature = self._checkpoint_signature()
+        if signature is None:
+            return self.ready
+        self._swap(self._build(signature), signature)
+        return True
+
+    def reload_if_changed_sync(self):
+        signature = self._checkpoint_signature()
+        if signature is None or signature == self._signature:
+            return False
+        return self.load_sync()
+
+    async def load(self):
+        """Load (or reload) the checkpoint at Config.MODEL_PATH. Returns True when a model is ready."""
+        async with self._lock:
+            signature = self._checkpoint_signature()
+            if signature is None:
+                return self.ready
+
+            try:
+                built = await asyncio.to_thread(self._build, signature)
+            except Exception as e:
+                self.reload_error = f"{type(e).__name__}: {e}"
+                self.reload_error_at = time.time()
+                self._failed_signature = signature
+                raise
+            self._swap(built, signature)
+            return True
+
+    async def reload_if_changed(self):
+        """Reload when Config.MODEL_PATH or the backend changes, or a checkpoint file was rewritten.
+
+        A checkpoint that failed to load is not retried until it changes again.
+        """
+        signature = self._checkpoint_signature()
+        if signature is None or signature in (self._signature, self._failed_signature):
+            return False
+        return await self.load()
+
+    async def _watch(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.reload_if_changed()
+            except Exception:
+                # Keep serving the previous model if the new checkpoint is broken or half-written
+                logger.exception("Could not reload model from %s", Config.MODEL_PATH)
+
+    def start_watcher(self, interval=None):
+        interval = Config.MODEL_RELOAD_INTERVAL if interval is None else interval
+        if interval > 0 and self._watcher is None:
+            self._watcher = asyncio.create_task(self._watch(interval))
+
+    async def stop_watcher(self):
+        if self._watcher is not None:
+            self._watcher.cancel()
+            try:
+                await self._watcher
+            except asyncio.CancelledError:
+                pass
+            self._watcher = None
+
+    def status(self):
+        return {
+            "ready": self.ready,
+            "model_path": self.model_path,
+            "backend": self.backend,
+            "mode": self.mode,
+            "version": self.version,
+            "loaded_at": self.loaded_at,
+            "reload_error": self.reload_error,
+            "reload_error_at": self.reload_error_at,
+            "device": str(self.device) if self.device is not None else None,
+        }
+
+
+model_registry = ModelRegistry()
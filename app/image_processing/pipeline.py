@@ -0,0 +1,123 @@
+import asyncio
+import os
+
+from app.image_processing.executor import pipeline_executor
+from app.image_processing.model_registry import model_registry
+from app.image_processing.scheduler import BACKGROUND, inference_scheduler
+from app.metrics import collect_stages, observe_stages, stage_latency
+from app.profiling import add_collected_spans, current_trace, span
+
+# predict and segmentation pull in torch, torchvision, cv2 and PIL, so they are imported
+# inside the functions below, which only run in pipeline workers after warmup
+
+
+def prepare_image(image_source, debug_dir=None, page=None):
+    """Decode, segment and fit the crops of one image (or one page). Runs inside the pipeline executor.
+
+    Returns the number of crops in each line and the crops as uint8 pixels, copied out of
+    the decoded image so it can be freed while the crops wait for the scheduler. They are
+    only converted to the model's float input one batch at a time, once the scheduler runs them.
+    """
+    from app.image_processing.predict import stack_pixels
+    from app.image_processing.segmentation import segment_with_resnet
+
+    lines = segment_with_resnet(image_source, debug_dir=debug_dir, page=page)
+    return [len(line) for line in lines], stack_pixels(lines)
+
+
+def run_pipeline(image_source, debug_dir=None, page=None):
+    """Full decode -> segment -> classify pass inside a process worker with its own model.
+
+    Returns (digits, stage timings).
+    """
+    from app.image_processing.predict import predict_all_digits
+    from app.image_processing.segmentation import segment_with_resnet
+
+    model_registry.reload_if_changed_sync()
+    if model_registry.model is None:
+        raise RuntimeError("Model not loaded")
+
+    # Stage timings recorded here would stay in the worker; return them to the API process
+    with collect_stages() as timings:
+        lines = segment_with_resnet(image_source, debug_dir=debug_dir, page=page)
+        digits = predict_all_digits(model_registry.model, model_registry.device, lines)
+    return digits, timings
+
+
+async def recognize(image_source, debug_dir=None, page=None):
+    """Recognize the digits in an image file path or encoded bytes without blocking the event loop.
+
+    page selects one page (0-based) of a multi-page file path.
+    """
+    if pipeline_executor.uses_processes:
+        with span("pipeline", worker="process"):
+            digits, timings = await pipeline_executor.run(run_pipeline, image_source, debug_dir, page)
+            observe_stages(timings)
+            add_collected_spans(timings, stage_latency.name)
+        return digits
+
+    from app.image_processing.predict import classify_batch, join_predictions
+
+    line_sizes, images = await pipeline_executor.run(prepare_image, image_source, debug_dir, page)
+    trace = current_trace()
+    if images is None:
+        digits = []
+    elif trace is not None and trace.profiles_calls:
+        # A profiled request runs its own forward pass so the profile holds only its crops
+        digits = await pipeline_executor.run(classify_batch, model_registry.model, images, model_registry.device)
+    else:
+        with span("classify", crops=images.shape[0]):
+            digits = await inference_scheduler.classify(images)
+    return join_predictions(line_sizes, digits)
+
+
+async def count_pages(image_path):
+    """Number of pages in an uploaded image file (1 unless it is a multi-page TIFF)."""
+    from app.image_processing.segmentation import page_count
+
+    return await asyncio.to_thread(page_count, image_path)
+
+
+async def recognize_pages(image_path, debug_dir=None, pages=None):
+    """Yield (page number, digits) for each page of a multi-page image file, starting at 1.
+
+    Pages are decoded one at a time, only when the caller asks for the next one, and each
+    goes through recognize() like a single image. A page that fails yields its exception
+    in place of the digits so the remaining pages still run. pages skips counting them
+    again when the caller already has.
+    """
+    if pages is None:
+        pages = await count_pages(image_path)
+    for page in range(pages):
+        page_dir = os.path.join(debug_dir, f"page_{page + 1}") if debug_dir is not None else None
+        try:
+            yield page + 1, await recognize(image_path, page_dir, page)
+        except Exception as e:
+            yield page + 1, e
+
+
+async def recognize_many(image_sources):
+    """Recognize several images, classifying the crops of all of them in shared batches.
+
+    Returns one entry per source, in order: the digits, or the exception raised for that
+    image, so one unreadable file doesn't fail the rest. Each image is queued on the
+    scheduler on its own at BACKGROUND priority, so interactive predictions go first.
+    """
+    if pipeline_executor.uses_processes:
+        # Each worker owns a model; parallelism comes from spreading whole images across them
+        results = await asyncio.gather(
+            *(pipeline_executor.run(run_pipeline, source) for source in image_sources), return_exceptions=True
+        )
+        for result in results:
+            if not isinstance(result, BaseException):
+                observe_stages(result[1])
+        return [result if isinstance(result, BaseException) else result[0] for result in results]
+
+    from app.image_processing.predict import join_predictions
+
+    async def recognize_one(source):
+        line_sizes, pixels = await pipeline_executor.run(prepare_image, source)
+        digits = await inference_scheduler.classify(pixels, BACKGROUND) if pixels is not None else []
+        return join_predictions(line_sizes, digits)
+
+    return await asyncio.gather(*(recognize_one(source) for source in image_sources), return_exceptions=True)
@@ -1,99 +1,126 @@
-import asyncio  # Async processing
-import os
-import re
+import threading
 
+import cv2
+import numpy as np
 import torch
-import torchvision.transforms as transforms
-from PIL import Image
-from torchvision.models import resnet18
-from torchvision.transforms.functional import invert
 
 from app.config import Config
+from app.image_processing.model_registry import input_shape
+from app.metrics import stage_timer
 
+_buffers = threading.local()
 
-async def load_model():
-    """Load the ResNet model asynchronously."""
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-    model = resnet18(weights=None)
-    num_ftrs = model.fc.in_features
-    model.fc = torch.nn.Linear(num_ftrs, 10)
 
-    model_path = Config.MODEL_PATH
-    if not os.path.exists(model_path):
-        return None
+def _staging_buffer(count, height, width):
+    """A count x height x width uint8 view of this thread's staging buffer, grown only when too small."""
+    buffer = getattr(_buffers, "staging", None)
+    if buffer is None or buffer.shape[0] < count or buffer.shape[1:] != (height, width):
+        buffer = _buffers.staging = np.empty((max(count, Config.MAX_BATCH_SIZE), height, width), dtype=np.uint8)
+    return buffer[:count]
+
+
+def fit_crop(crop, out, padding):
+    """Scale a dark-on-light grayscale crop into out without changing its aspect ratio.
+
+    The digit is centered with a margin of padding x the side on every side, the way MNIST
+    digits sit in their 28 x 28 frame, and the rest of out is filled with the crop's paper
+    color. Tall digits such as 1 and 7 are no longer stretched to a square.
+    """
+    out_height, out_width = out.shape
+    height, width = crop.shape
+    scale = min(out_height * (1 - 2 * padding) / height, out_width * (1 - 2 * padding) / width)
+    new_height, new_width = max(1, round(height * scale)), max(1, round(width * scale))
+    interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+
+    out.fill(crop.max())
+    top, left = (out_height - new_height) // 2, (out_width - new_width) // 2
+    resized = cv2.resize(crop, (new_width, new_height), interpolation=interpolation)
+    out[top:top + new_height, left:left + new_width] = resized
+
+
+def fit_crops(crops, out, padding=None):
+    """Fit each grayscale uint8 crop into its slot of an N x H x W uint8 array."""
+    padding = Config.CROP_PADDING if padding is None else padding
+    for crop, slot in zip(crops, out):
+        fit_crop(crop, slot, padding)
+    return out
+
+
+def normalize_pixels(pixels, mode=None):
+    """Turn an N x H x W uint8 tensor of fitted crops into the N x C x H x W float input of the CLASSIFIER_MODE.
+
+    The batch is inverted to white-on-black and normalized to [-1, 1] in a single tensor operation.
+    """
+    channels = input_shape(mode)[0]
+    # (255 - x) / 255 normalized with mean 0.5 and std 0.5 is 1 - x * 2 / 255
+    images = pixels.to(torch.float32).mul_(-2 / 255).add_(1).unsqueeze(1)
+    return images.expand(-1, channels, -1, -1).contiguous() if channels > 1 else images
 
-    model_state = await asyncio.to_thread(torch.load, model_path, map_location=device)
-    model.load_state_dict(model_state)
-    model.to(device)
-    model.eval()
-    return model
 
+def preprocess_crops(crops, mode=None, padding=None):
+    """Turn a list of grayscale uint8 crops into one N x C x H x W input for the CLASSIFIER_MODE.
 
-async def transform_image(image_path):
-    """Apply transformations asynchronously."""
-    transform = transforms.Compose([
-        transforms.Grayscale(num_output_channels=3),
-        transforms.Lambda(lambda x: invert(x)),
-        transforms.Resize((224, 224)),
-        transforms.ToTensor(),
-        transforms.Normalize((0.5,), (0.5,))
-    ])
+    Each crop is fitted into a reused per-thread staging buffer, which the float conversion
+    then copies out of.
+    """
+    _, height, width = input_shape(mode)
+    staging = fit_crops(crops, _staging_buffer(len(crops), height, width), padding)
+    return normalize_pixels(torch.from_numpy(staging), mode)
 
-    image = await asyncio.to_thread(Image.open, image_path)
-    image = image.convert("L")
 
-    return transform(image).unsqueeze(0)
+def transform_image(crop, mode=None):
+    """Turn a single in-memory crop into a 1 x C x H x W input for the CLASSIFIER_MODE."""
+    return preprocess_crops([crop], mode)
 
 
-def extract_number(filename):
-    """Extract numeric parts from filenames for sorting."""
-    match = re.search(r'(\d+)', filename)
-    return int(match.group(1)) if match else 0  # Default to 0 instead of float('inf')
+def stack_crops(lines):
+    """Preprocess every crop of every line into one N x C x H x W tensor, in reading order."""
+    crops = [crop.image for line in lines for crop in line]
+    if not crops:
+        return None
+    with stage_timer("transform"):
+        return preprocess_crops(crops)
+
 
+def stack_pixels(lines, mode=None):
+    """Fit every crop of every line into one N x H x W uint8 tensor, in reading order.
 
-async def predict_digits(model, image_folder, device):
-    """Predict digits from images asynchronously."""
-    if not os.path.exists(image_folder):
-        return ""
+    A twelfth of the float input's size for a 3-channel model, so crops waiting for the
+    inference scheduler stay small; classify_batch normalizes them one chunk at a time.
+    """
+    crops = [crop.image for line in lines for crop in line]
+    if not crops:
+        return None
+    _, height, width = input_shape(mode)
+    with stage_timer("transform"):
+        return torch.from_numpy(fit_crops(crops, np.empty((len(crops), height, width), dtype=np.uint8)))
 
+
+def classify_batch(model, images, device, max_batch_size=None):
+    """Classify a stacked N x C x H x W tensor, or N x H x W uint8 pixels, in chunks of at most max_batch_size crops."""
+    max_batch_size = max_batch_size or Config.MAX_BATCH_SIZE
     predictions = []
-    files = sorted(
-        [f for f in os.listdir(image_folder) if f.lower().endswith(('.png', '.jpg', '.jpeg'))],
-        key=extract_number
-    )
-
-    for filename in files:
-        image_path = os.path.join(image_folder, filename)
-        image = await transform_image(image_path)
-        image = image.to(device)
-
-        with torch.no_grad():
-            output = model(image)
-            predicted_digit = torch.argmax(output, dim=1).item()
-            predictions.append(str(predicted_digit))
-
-    return "".join(predictions)
-
-
-async def predict_all_digits(user_id, base_folder):
-    """Main function to predict digits for a user asynchronously."""
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-    model = await load_model()
-    if model is None:
-        return ""
-
-    user_folder = os.path.join(base_folder, f"user_{user_id}")
-    if not os.path.exists(user_folder):
-        return ""
-
-    line_folders = sorted(
-        [folder for folder in os.listdir(user_folder) if folder.startswith("temp_folder_")],
-        key=extract_number
-    )
-
-    tasks = [
-        predict_digits(model, os.path.join(user_folder, folder), device) for folder in line_folders
-    ]
-
-    results = await asyncio.gather(*tasks)
-    return "_".join(results)
+
+    with stage_timer("forward"), torch.inference_mode():
+        for start in range(0, images.shape[0], max_batch_size):
+            chunk = images[start:start + max_batch_size]
+            if chunk.dtype == torch.uint8:
+                chunk = normalize_pixels(chunk)
+            chunk = chunk.to(device)
+            output = model(chunk)
+            predictions.extend(torch.argmax(output, dim=1).tolist())
+
+    return predictions
+
+
+def join_predictions(line_sizes, digits):
+    """Map flat predictions back onto lines of line_sizes digits each, joined line by line with "_"."""
+    digits = iter(digits)
+    return "_".join("".join(str(next(digits)) for _ in range(size)) for size in line_sizes)
+
+
+def predict_all_digits(model, device, lines):
+    """Predict the digits of segmented lines with a local model (no cross-request batching)."""
+    images = stack_crops(lines)
+    digits = classify_batch(model, images, device) if images is not None else []
+    return join_predictions([len(line) for line in lines], digits)
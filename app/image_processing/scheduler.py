@@ -0,0 +1,188 @@
+import asyncio
+import itertools
+from typing import Any, NamedTuple
+
+from app.config import Config
+from app.image_processing.executor import pipeline_executor
+from app.image_processing.model_registry import model_registry
+from app.metrics import batch_size
+
+
+# Queue priorities; lower is served first
+INTERACTIVE = 0
+BACKGROUND = 1
+
+
+class _PendingRequest(NamedTuple):
+    priority: int
+    sequence: int  # FIFO within a priority; also keeps the tensors out of comparisons
+    images: Any  # torch.Tensor, N x C x H x W or N x H x W uint8
+    future: asyncio.Future
+
+
+class InferenceScheduler:
+    """Gather crops from concurrent requests into shared forward passes.
+
+    Callers submit a stacked tensor of crops and get back only their own predictions.
+    A single worker task waits up to max_wait_ms after the first pending request to fill
+    a batch of at most max_batch_size crops, then runs the model once for all of them.
+    Requests larger than max_batch_size are queued in slices, and BACKGROUND requests
+    (bulk predictions) only fill a batch once no INTERACTIVE crops are waiting.
+    """
+
+    def __init__(self, registry, max_batch_size=None, max_wait_ms=None):
+        self.registry = registry
+        self.max_batch_size = max_batch_size or Config.MAX_BATCH_SIZE
+        self.max_wait = (Config.SCHEDULER_MAX_WAIT_MS if max_wait_ms is None else max_wait_ms) / 1000
+        self._queue = None
+        self._worker = None
+        self._sequence = itertools.count()
+
+        # Stats
+        self.queued_crops = 0
+        self.batches = 0
+        self.batched_crops = 0
+        self.batched_requests = 0
+        self.max_observed_batch = 0
+        self.last_batch_size = 0
+
+    def start(self):
+        if self._worker is None:
+            self._queue = asyncio.PriorityQueue()
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+
+        # Fail anything still waiting so callers don't hang on shutdown
+        while not self._queue.empty():
+            request = self._queue.get_nowait()
+            if not request.future.done():
+                request.future.set_exception(RuntimeError("Inference scheduler stopped"))
+        self.queued_crops = 0
+
+    async def classify(self, images, priority=INTERACTIVE):
+        """Queue a N x C x H x W tensor (or N x H x W uint8 pixels) and wait for its N predicted digits."""
+        if images.shape[0] == 0:
+            return []
+        if self._worker is None:
+            raise RuntimeError("Inference scheduler is not running")
+
+        loop = asyncio.get_running_loop()
+        futures = []
+        for start in range(0, images.shape[0], self.max_batch_size):
+            chunk = images[start:start + self.max_batch_size]
+            future = loop.create_future()
+            self.queued_crops += chunk.shape[0]
+            await self._queue.put(_PendingRequest(priority, next(self._sequence), chunk, future))
+            futures.append(future)
+        try:
+            results = await asyncio.gather(*futures)
+        finally:
+            # A caller that gives up drops the slices that have not run yet
+            for future in futures:
+                future.cancel()
+        return [digit for result in results for digit in result]
+
+    async def _collect(self):
+        """Wait for one request, then keep adding requests until the batch is full or the window closes.
+
+        A batch never holds more than max_batch_size crops: classify() slices larger requests,
+        and a request that would overflow the batch is left queued for the next one.
+        """
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        size = batch[0].images.shape[0]
+        deadline = loop.time() + self.max_wait
+
+        while size < self.max_batch_size:
+            if self._queue.empty():
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    request = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            else:
+                request = self._queue.get_nowait()
+
+            if size + request.images.shape[0] > self.max_batch_size:
+                # Back in its place by (priority, sequence); it opens the next batch
+                self._queue.put_nowait(request)
+                break
+            batch.append(request)
+            size += request.images.shape[0]
+
+        return batch, size
+
+    async def _run(self):
+        # Deferred so importing the API doesn't pull in torch; the worker starts in the lifespan
+        import torch
+
+        from app.image_processing.predict import classify_batch
+
+        while True:
+            batch, size = await self._collect()
+            self.queued_crops -= size
+
+            # Drop callers that gave up while waiting
+            batch = [request for request in batch if not request.future.done()]
+            if not batch:
+                continue
+            size = sum(request.images.shape[0] for request in batch)
+
+            self.batches += 1
+            self.batched_crops += size
+            self.batched_requests += len(batch)
+            self.last_batch_size = size
+            self.max_observed_batch = max(self.max_observed_batch, size)
+            batch_size.observe(size)
+
+            try:
+                model = self.registry.model
+                if model is None:
+                    raise RuntimeError("Model not loaded")
+
+                images = torch.cat([request.images for request in batch])
+                # Run the forward pass off the loop so the next batch can fill up meanwhile
+                predictions = await pipeline_executor.run(
+                    classify_batch, model, images, self.registry.device, self.max_batch_size
+                )
+            except Exception as e:
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+                continue
+
+            offset = 0
+            for request in batch:
+                count = request.images.shape[0]
+                if not request.future.done():
+                    request.future.set_result(predictions[offset:offset + count])
+                offset += count
+
+    def stats(self):
+        return {
+            "running": self._worker is not None,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "queued_crops": self.queued_crops,
+            "batches": self.batches,
+            "batched_requests": self.batched_requests,
+            "batched_crops": self.batched_crops,
+            "avg_batch_size": self.batched_crops / self.batches if self.batches else 0.0,
+            "max_batch_size": self.max_observed_batch,
+            "last_batch_size": self.last_batch_size,
+            "max_batch_limit": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+        }
+
+
+inference_scheduler = InferenceScheduler(model_registry)
@@ -1,95 +1,194 @@
-import asyncio  # Async processing
+import math
 import os
+from typing import NamedTuple
 
 import cv2
-import torch.nn as nn
-import torchvision.transforms as transforms
-from PIL import Image
-from torchvision import models
+import numpy as np
 
 from ..config import Config
+from ..metrics import crops_per_image, observe, stage_timer
+from .headers import MAX_DECODE_REDUCTION, REDUCED_DECODE_FORMATS, image_format, image_size
 
+# Decode flags by scale reduction; JPEGs are decoded straight to the reduced size
+_REDUCED_GRAYSCALE = {
+    1: cv2.IMREAD_GRAYSCALE,
+    2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+    4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    8: cv2.IMREAD_REDUCED_GRAYSCALE_8,
+}
 
-async def create_segmentation_model():
-    """Load a pretrained ResNet-18 model asynchronously and modify it for segmentation."""
-    model = models.resnet18(weights=models.ResNet18_Weights.DEFAULT)
-    model.fc = nn.Sequential(
-        nn.Linear(model.fc.in_features, 512),
-        nn.ReLU(),
-        nn.Linear(512, 1),
-        nn.Sigmoid()
-    )
-    return model
 
+class DigitCrop(NamedTuple):
+    """A single digit crop with its position in the page."""
+    line: int
+    column: int
+    image: np.ndarray
 
-async def preprocess_image(image_path):
-    """Preprocess input image asynchronously for ResNet-18."""
-    transform = transforms.Compose([
-        transforms.Grayscale(num_output_channels=3),
-        transforms.Resize((224, 224)),
-        transforms.ToTensor(),
-        transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
-    ])
 
-    image = await asyncio.to_thread(Image.open, image_path)
-
-    return transform(image).unsqueeze(0)
-
-
-async def segment_with_resnet(image_path, user_id, output_base_dir=None):
-    """Segment handwritten text into lines using a modified ResNet-18 asynchronously."""
-    output_base_dir = output_base_dir or os.path.join(Config.TEMP_FOLDERS_PATH, f"user_{user_id}")
-    os.makedirs(output_base_dir, exist_ok=True)
-
-    if not os.path.exists(image_path):
-        raise FileNotFoundError(f"Image file not found: {image_path}")
+def save_segments(lines, output_base_dir):
+    """Dump crops as temp_folder_<line>/digit_<column>.png for debugging."""
+    for line_idx, line in enumerate(lines):
+        line_folder = os.path.join(output_base_dir, f"temp_folder_{line_idx}")
+        os.makedirs(line_folder, exist_ok=True)
+        for crop in line:
+            cv2.imwrite(os.path.join(line_folder, f"digit_{crop.column}.png"), crop.image)
 
-    image = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
-    if image is None:
-        raise ValueError(f"Failed to read image: {image_path}")
 
+def find_boxes(image):
+    """Return an N x 4 (x, y, w, h) array with one box per ink component of a grayscale image."""
     _, thresh = cv2.threshold(image, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
-    contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    _, _, stats, _ = cv2.connectedComponentsWithStats(thresh, connectivity=8)
+    # Row 0 is the background component
+    return stats[1:, :4]
 
-    bounding_boxes = sorted([cv2.boundingRect(contour) for contour in contours], key=lambda x: x[1])
-    line_threshold = Config.LINE_THRESHOLD
 
-    lines = []
-    current_line = []
-    prev_y = -line_threshold
+def group_lines(boxes, line_threshold, min_height):
+    """Group boxes into lines and order them for reading, without a Python loop over boxes.
 
-    for box in bounding_boxes:
-        x, y, w, h = box
-        if abs(y - prev_y) > line_threshold:
-            if current_line:
-                lines.append(sorted(current_line, key=lambda x: x[0]))
-            current_line = [box]
-        else:
-            current_line.append(box)
-        prev_y = y
-
-    if current_line:
-        lines.append(sorted(current_line, key=lambda x: x[0]))
+    Boxes are sorted by top edge and a new line starts wherever the gap to the previous
+    top edge exceeds line_threshold. Returns (boxes, line_ids, columns, line_count) for the
+    boxes taller than min_height, sorted by line and then left to right. Columns are
+    1-based positions within the line counted before the height filter.
+    """
+    if len(boxes) == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return boxes, empty, empty, 0
 
-    original_image = cv2.imread(image_path)
-    original_image = cv2.cvtColor(original_image, cv2.COLOR_BGR2RGB)  # Ensure correct color format
+    boxes = boxes[np.argsort(boxes[:, 1], kind="stable")]
+    line_ids = np.concatenate(([0], np.cumsum(np.abs(np.diff(boxes[:, 1])) > line_threshold)))
 
-    async def save_segment(segment, segment_path):
-        """Asynchronously save image segment."""
-        await asyncio.to_thread(cv2.imwrite, segment_path, segment)
+    order = np.lexsort((boxes[:, 0], line_ids))
+    boxes, line_ids = boxes[order], line_ids[order]
 
-    async def process_line(line_idx, line):
-        """Process each segmented line asynchronously."""
-        line_folder = os.path.join(output_base_dir, f"temp_folder_{line_idx}")
-        os.makedirs(line_folder, exist_ok=True)
+    line_starts = np.searchsorted(line_ids, line_ids, side="left")
+    columns = np.arange(len(boxes)) - line_starts + 1
 
-        tasks = [
-            save_segment(original_image[y:y + h, x:x + w], os.path.join(line_folder, f"digit_{digit_idx + 1}.png"))
-            for digit_idx, (x, y, w, h) in enumerate(line) if h > Config.MIN_SEGMENT_HEIGHT
-        ]
+    keep = boxes[:, 3] > min_height
+    return boxes[keep], line_ids[keep], columns[keep], int(line_ids[-1]) + 1
 
-        await asyncio.gather(*tasks)
 
-    await asyncio.gather(*(process_line(line_idx, line) for line_idx, line in enumerate(lines)))
+def decode_grayscale(image_source, reduction=1):
+    """Decode an image file path or its encoded bytes to a grayscale array at 1/reduction scale."""
+    flag = _REDUCED_GRAYSCALE[reduction]
+    if isinstance(image_source, (bytes, bytearray, memoryview)):
+        image = cv2.imdecode(np.frombuffer(image_source, dtype=np.uint8), flag)
+        if image is None:
+            raise ValueError("Failed to decode image bytes")
+        return image
 
-    return output_base_dir  # Returns user-specific folder path
+    if not os.path.exists(image_source):
+        raise FileNotFoundError(f"Image file not found: {image_source}")
+    image = cv2.imread(image_source, flag)
+    if image is None:
+        raise ValueError(f"Failed to read image: {image_source}")
+    return image
+
+
+def decode_reduction(size, pixel_budget, reducible=True):
+    """Smallest reduction (1, 2, 4 or 8) that brings an image of size (width, height) within pixel_budget.
+
+    reducible is False for formats that are decoded at full size whatever the flags ask for;
+    those must fit the budget as they are.
+    """
+    if size is None:
+        return 1
+    width, height = size
+    for reduction in _REDUCED_GRAYSCALE if reducible else (1,):
+        if (width // reduction) * (height // reduction) <= pixel_budget:
+            return reduction
+    scale = f"1/{MAX_DECODE_REDUCTION}" if reducible else "full"
+    raise ValueError(f"Image of {width} x {height} pixels is over the decode budget at {scale} scale")
+
+
+def page_count(image_path):
+    """Number of pages in an image file. Only TIFFs are opened past their first bytes."""
+    if image_format(image_path) != "tiff":
+        return 1
+    # imcount returns 0 for unreadable files; decoding the page then reports the error
+    return max(cv2.imcount(image_path), 1)
+
+
+def decode_page(image_path, page, pixel_budget):
+    """Decode one page (0-based) of a multi-page file to grayscale; returns (image, reduction).
+
+    imreadmulti ignores the reduced decode flags, so a page over pixel_budget is decoded at
+    full size and scaled down right away.
+    """
+    ok, pages = cv2.imreadmulti(image_path, page, 1, flags=cv2.IMREAD_GRAYSCALE)
+    if not ok or not pages:
+        raise ValueError(f"Failed to read page {page + 1} of {image_path}")
+    image = pages[0]
+    height, width = image.shape
+    reduction = decode_reduction((width, height), pixel_budget)
+    if reduction > 1:
+        image = cv2.resize(image, (width // reduction, height // reduction), interpolation=cv2.INTER_AREA)
+    return image, reduction
+
+
+def downscale(image, max_pixels):
+    """Return a copy of image with at most max_pixels pixels, and its (x, y) scale back to image."""
+    height, width = image.shape
+    if height * width <= max_pixels:
+        return image, 1.0, 1.0
+    factor = math.sqrt(height * width / max_pixels)
+    size = (max(1, int(width / factor)), max(1, int(height / factor)))
+    small = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+    return small, width / small.shape[1], height / small.shape[0]
+
+
+def scale_boxes(boxes, scale_x, scale_y, shape):
+    """Map (x, y, w, h) boxes found on a downscaled copy onto the full image, growing them to whole pixels."""
+    height, width = shape
+    x0 = np.floor(boxes[:, 0] * scale_x)
+    y0 = np.floor(boxes[:, 1] * scale_y)
+    x1 = np.minimum(np.ceil((boxes[:, 0] + boxes[:, 2]) * scale_x), width)
+    y1 = np.minimum(np.ceil((boxes[:, 1] + boxes[:, 3]) * scale_y), height)
+    return np.stack((x0, y0, x1 - x0, y1 - y0), axis=1).astype(np.int64)
+
+
+def segment_with_resnet(image_source, debug_dir=None, page=None):
+    """Segment handwritten text into lines of in-memory digit crops.
+
+    CPU-bound: call it through the pipeline executor, never directly on the event loop.
+
+    image_source is a file path or the encoded image bytes; page selects a single page
+    (0-based) of a multi-page file path instead of the first one. Returns one list of
+    DigitCrop per detected line, in reading order. When debug_dir is given the crops are
+    also written to disk.
+    """
+    # Memory stays bounded whatever the input size: the image is decoded within
+    # IMAGE_PIXEL_BUDGET, lines and components are found on a copy of at most
+    # ANALYSIS_MAX_PIXELS, and crops are views into the decoded image, not copies.
+    with stage_timer("decode"):
+        if isinstance(image_source, str) and not os.path.exists(image_source):
+            raise FileNotFoundError(f"Image file not found: {image_source}")
+        if page is None:
+            reducible = image_format(image_source) in REDUCED_DECODE_FORMATS
+            reduction = decode_reduction(image_size(image_source), Config.IMAGE_PIXEL_BUDGET, reducible)
+            image = decode_grayscale(image_source, reduction)
+        else:
+            image, reduction = decode_page(image_source, page, Config.IMAGE_PIXEL_BUDGET)
+
+    with stage_timer("threshold"):
+        analysis, scale_x, scale_y = downscale(image, Config.ANALYSIS_MAX_PIXELS)
+        boxes = find_boxes(analysis)
+
+    with stage_timer("group"):
+        # LINE_THRESHOLD and MIN_SEGMENT_HEIGHT are in pixels of the original image
+        to_analysis = reduction * scale_y
+        boxes, line_ids, columns, line_count = group_lines(
+            boxes, Config.LINE_THRESHOLD / to_analysis, Config.MIN_SEGMENT_HEIGHT / to_analysis
+        )
+        if analysis is not image:
+            boxes = scale_boxes(boxes, scale_x, scale_y, image.shape)
+
+    with stage_timer("crop"):
+        crops = [[] for _ in range(line_count)]
+        for (x, y, w, h), line_idx, column in zip(boxes.tolist(), line_ids.tolist(), columns.tolist()):
+            crops[line_idx].append(DigitCrop(line_idx, column, image[y:y + h, x:x + w]))
+    observe(crops_per_image, len(boxes))
+
+    if debug_dir is not None:
+        save_segments(crops, debug_dir)
+
+    return crops
@@ -0,0 +1,101 @@
+"""Train the compact 28 x 28 classifier on MNIST and measure its accuracy delta.
+
+    python -m app.image_processing.train_compact --output compact_mnist.pth
+    python -m app.image_processing.train_compact --reference-model fine_tuned_resnet_mnist.pth --eval-limit 2000
+
+Deploy the result with MODEL_PATH=compact_mnist.pth CLASSIFIER_MODE=compact.
+"""
+import argparse
+import time
+
+import torch
+import torchvision.transforms as transforms
+from torch import nn
+from torch.utils.data import DataLoader, Subset
+from torchvision.datasets import MNIST
+
+from app.image_processing.architectures import build_model, load_eager_model
+from app.image_processing.model_registry import input_shape
+
+
+def mnist_transform(mode, train=False):
+    """MNIST is already white-on-black and padded, so this is preprocess_crops without the invert and fit."""
+    channels, height, width = input_shape(mode)
+    steps = [transforms.RandomAffine(10, translate=(0.1, 0.1), scale=(0.85, 1.1))] if train else []
+    steps += [
+        transforms.Grayscale(num_output_channels=channels),
+        transforms.Resize((height, width)),
+        transforms.ToTensor(),
+        transforms.Normalize((0.5,), (0.5,)),
+    ]
+    return transforms.Compose(steps)
+
+
+def evaluate(model, loader, device):
+    model.eval()
+    correct = total = 0
+    start = time.perf_counter()
+    with torch.inference_mode():
+        for images, labels in loader:
+            predictions = model(images.to(device)).argmax(dim=1).cpu()
+            correct += (predictions == labels).sum().item()
+            total += labels.numel()
+    return correct / total, (time.perf_counter() - start) * 1000 / total
+
+
+def test_loader(data_dir, mode, limit, batch_size):
+    dataset = MNIST(data_dir, train=False, download=True, transform=mnist_transform(mode))
+    if limit:
+        dataset = Subset(dataset, range(min(limit, len(dataset))))
+    return DataLoader(dataset, batch_size=batch_size)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", default="compact_mnist.pth")
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--epochs", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=128)
+    parser.add_argument("--lr", type=float, default=1e-3)
+    parser.add_argument("--reference-model", help="ResNet checkpoint to compare accuracy against")
+    parser.add_argument("--eval-limit", type=int, default=0, help="Evaluate on the first N test images only")
+    args = parser.parse_args(argv)
+
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    train_set = MNIST(args.data_dir, train=True, download=True, transform=mnist_transform("compact", train=True))
+    train_loader = DataLoader(train_set, batch_size=args.batch_size, shuffle=True)
+    compact_test = test_loader(args.data_dir, "compact", args.eval_limit, args.batch_size)
+
+    model = build_model("compact").to(device)
+    optimizer = torch.optim.Adam(model.parameters(), lr=args.lr)
+    scheduler = torch.optim.lr_scheduler.OneCycleLR(
+        optimizer, max_lr=args.lr * 3, epochs=args.epochs, steps_per_epoch=len(train_loader)
+    )
+    criterion = nn.CrossEntropyLoss()
+
+    for epoch in range(args.epochs):
+        model.train()
+        for images, labels in train_loader:
+            optimizer.zero_grad()
+            loss = criterion(model(images.to(device)), labels.to(device))
+            loss.backward()
+            optimizer.step()
+            scheduler.step()
+
+        accuracy, _ = evaluate(model, compact_test, device)
+        print(f"epoch {epoch + 1}/{args.epochs}: loss {loss.item():.4f}, test accuracy {accuracy:.2%}")
+
+    torch.save(model.state_dict(), args.output)
+    compact_accuracy, compact_ms = evaluate(model, compact_test, device)
+    print(f"compact: accuracy {compact_accuracy:.2%}, {compact_ms:.3f} ms/digit -> {args.output}")
+
+    if args.reference_model:
+        reference = load_eager_model(args.reference_model, device, "resnet")
+        resnet_test = test_loader(args.data_dir, "resnet", args.eval_limit, args.batch_size)
+        resnet_accuracy, resnet_ms = evaluate(reference, resnet_test, device)
+        print(f"resnet:  accuracy {resnet_accuracy:.2%}, {resnet_ms:.3f} ms/digit")
+        print(f"delta:   {compact_accuracy - resnet_accuracy:+.2%} accuracy, {resnet_ms / compact_ms:.1f}x faster")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+from app.config import Config
+
+
+@contextmanager
+def scratch_workspace(prefix="predict-", keep=False):
+    """Yield a fresh directory that belongs to a single request.
+
+    Directories are created with a unique name under SCRATCH_DIR (point it at a tmpfs
+    such as /dev/shm to keep scratch I/O in memory), so concurrent requests, even from
+    the same user, never share one. The directory is removed on exit unless keep is set.
+    """
+    os.makedirs(Config.SCRATCH_DIR, exist_ok=True)
+    path = tempfile.mkdtemp(prefix=prefix, dir=Config.SCRATCH_DIR)
+    try:
+        yield path
+    finally:
+        if not keep:
+            shutil.rmtree(path, ignore_errors=True)
@@ -0,0 +1,217 @@
+"""Minimal in-process metrics rendered in the Prometheus text exposition format.
+
+Observations are a bisect plus a few additions under a lock, cheap enough to leave on
+under full load. Pipeline stages are timed with stage_timer() and other pipeline values
+go through observe(); process-pool workers collect both with collect_stages() and hand
+them back to the API process, where they are recorded with observe_stages().
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from app.profiling import finish_span, start_span
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} counter"
+        for labels, value in sorted(self._values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {value}"
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def render(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        for labels, series in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), series):
+                cumulative += count
+                le = (("le", bound if bound == "+Inf" else repr(float(bound))),)
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, labels)} {series[-1]}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}"
+
+
+class Gauge:
+    """Read at scrape time from a callback returning {labels tuple: value} or a number."""
+
+    def __init__(self, name, documentation, callback, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.labelnames = tuple(labelnames)
+
+    def render(self):
+        values = self.callback()
+        if not isinstance(values, dict):
+            values = {(): values}
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} gauge"
+        for labels, value in sorted(values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {float(value)}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def get(self, name):
+        return next(metric for metric in self._metrics if metric.name == name)
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name, documentation, callback, labelnames=()):
+        return self.register(Gauge(name, documentation, callback, labelnames))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            try:
+                lines.extend(metric.render())
+            except Exception:
+                # A failing gauge callback must not take the whole scrape down
+                continue
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.counter(
+    "http_requests_total", "HTTP requests by route, method and status code.", ("method", "route", "status")
+)
+http_latency = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route and method.", ("method", "route")
+)
+stage_latency = registry.histogram(
+    "pipeline_stage_duration_seconds",
+    "Time spent in each pipeline stage (decode, threshold, group, crop, transform, forward, db_write).",
+    ("stage",),
+)
+crops_per_image = registry.histogram(
+    "pipeline_crops_per_image", "Digit crops segmented from each image.", buckets=SIZE_BUCKETS
+)
+batch_size = registry.histogram(
+    "inference_batch_size", "Crops per forward pass of the inference scheduler.", buckets=SIZE_BUCKETS
+)
+
+_collector = threading.local()
+
+
+def observe(histogram, value, *labels):
+    """Observe a value, or collect it when the thread is inside collect_stages()."""
+    collected = getattr(_collector, "timings", None)
+    if collected is not None:
+        collected.append((histogram.name, value, labels))
+    else:
+        histogram.observe(value, *labels)
+
+
+def observe_stages(collected):
+    """Record the (metric name, value, labels) entries returned by a process-pool worker."""
+    for name, value, labels in collected:
+        registry.get(name).observe(value, *labels)
+
+
+@contextmanager
+def collect_stages():
+    """Collect this thread's observations into a list instead of recording them."""
+    timings = []
+    previous = getattr(_collector, "timings", None)
+    _collector.timings = timings
+    try:
+        yield timings
+    finally:
+        _collector.timings = previous
+
+
+@contextmanager
+def stage_timer(stage):
+    """Time a pipeline stage into stage_latency, and into the request's span tree when it is traced."""
+    opened = start_span(stage)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage_latency, time.perf_counter() - start, stage)
+        if opened is not None:
+            finish_span(opened)
+
+
+class MetricsMiddleware:
+    """Count requests and time them per route template (e.g. /jobs/{job_id}), not per raw path."""
+
+    def __init__(self, app, exclude=("/metrics",)):
+        self.app = app
+        self.exclude = frozenset(exclude)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exclude:
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            http_requests.inc(scope["method"], path, status)
+            http_latency.observe(time.perf_counter() - start, scope["method"], path)
@@ -0,0 +1,209 @@
+"""Opt-in per-request tracing and profiling for the prediction endpoints.
+
+A request is traced when PROFILE_HEADER_ENABLED is set and it carries
+"X-Profile: spans|cprofile|torch", or when it is picked by PROFILE_SAMPLE_RATE. Traced
+requests record a span tree (stage_timer() stages plus explicit span() blocks) and, for
+the cprofile and torch modes, one profile file per pipeline executor call. Everything
+is written to PROFILE_DIR as <trace id>*.json / .prof, and the trace id is returned in
+the X-Profile-Id response header.
+
+When nothing is traced, span() and stage_timer() cost one ContextVar lookup, and the
+middleware is not installed at all unless sampling or the header is enabled.
+"""
+import asyncio
+import cProfile
+import json
+import os
+import random
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from app.config import Config
+
+PROFILE_MODES = ("spans", "cprofile", "torch")
+_current_span = ContextVar("profiling_span", default=None)
+
+
+class Span:
+    __slots__ = ("name", "trace", "start", "end", "children", "attributes")
+
+    def __init__(self, name, trace, start=None, end=None, **attributes):
+        self.name = name
+        self.trace = trace
+        self.start = time.perf_counter() if start is None else start
+        self.end = end
+        self.children = []
+        self.attributes = attributes
+
+    def to_dict(self, origin):
+        end = self.end if self.end is not None else time.perf_counter()
+        node = {
+            "name": self.name,
+            "start_ms": round((self.start - origin) * 1000, 3),
+            "duration_ms": round((end - self.start) * 1000, 3),
+        }
+        if self.attributes:
+            node["attributes"] = self.attributes
+        if self.children:
+            node["children"] = [child.to_dict(origin) for child in self.children]
+        return node
+
+
+class Trace:
+    def __init__(self, mode, name):
+        self.id = uuid.uuid4().hex
+        self.mode = mode
+        self.root = Span(name, self)
+        self.files = []
+
+    @property
+    def profiles_calls(self):
+        return self.mode in ("cprofile", "torch")
+
+    def profile_path(self, label):
+        extension = "prof" if self.mode == "cprofile" else "json"
+        path = os.path.join(Config.PROFILE_DIR, f"{self.id}-{len(self.files)}-{label}.{extension}")
+        self.files.append(path)
+        return path
+
+    def to_dict(self, **extra):
+        return {
+            "trace_id": self.id,
+            "mode": self.mode,
+            **extra,
+            "spans": self.root.to_dict(self.root.start),
+            "profiles": self.files,
+        }
+
+
+def current_trace():
+    span = _current_span.get()
+    return span.trace if span is not None else None
+
+
+def start_span(name, **attributes):
+    """Open a child of the current span; returns None (and does nothing) when not tracing."""
+    parent = _current_span.get()
+    if parent is None:
+        return None
+    child = Span(name, parent.trace, **attributes)
+    parent.children.append(child)
+    return child, _current_span.set(child)
+
+
+def finish_span(opened):
+    child, token = opened
+    child.end = time.perf_counter()
+    _current_span.reset(token)
+
+
+@contextmanager
+def span(name, **attributes):
+    opened = start_span(name, **attributes)
+    try:
+        yield
+    finally:
+        if opened is not None:
+            finish_span(opened)
+
+
+def add_collected_spans(collected, stage_metric):
+    """Lay out the stage timings returned by a process-pool worker as back-to-back child spans."""
+    parent = _current_span.get()
+    if parent is None:
+        return
+    start = parent.start
+    for name, seconds, labels in collected:
+        if name == stage_metric:
+            parent.children.append(Span(labels[0], parent.trace, start, start + seconds, worker="process"))
+            start += seconds
+
+
+class ProfiledCall:
+    """Picklable wrapper running fn under cProfile or torch.profiler and saving the result to path."""
+
+    def __init__(self, fn, mode, path):
+        self.fn = fn
+        self.mode = mode
+        self.path = path
+
+    def __call__(self, *args, **kwargs):
+        if self.mode == "cprofile":
+            profile = cProfile.Profile()
+            try:
+                return profile.runcall(self.fn, *args, **kwargs)
+            finally:
+                profile.dump_stats(self.path)
+
+        import torch.profiler
+
+        with torch.profiler.profile(activities=[torch.profiler.ProfilerActivity.CPU], record_shapes=True) as profile:
+            result = self.fn(*args, **kwargs)
+        profile.export_chrome_trace(self.path)
+        return result
+
+
+def profiled(fn):
+    """Wrap fn for the current trace's profiler, or return it unchanged."""
+    trace = current_trace()
+    if trace is None or not trace.profiles_calls:
+        return fn
+    return ProfiledCall(fn, trace.mode, trace.profile_path(getattr(fn, "__name__", "call")))
+
+
+def enabled():
+    return Config.PROFILE_HEADER_ENABLED or Config.PROFILE_SAMPLE_RATE > 0
+
+
+def _write_trace(path, document):
+    with open(path, "w") as f:
+        json.dump(document, f, indent=2)
+
+
+class ProfilingMiddleware:
+    """Decide per request whether to trace it, and write the trace when the response is done."""
+
+    def __init__(self, app, paths):
+        self.app = app
+        self.paths = frozenset(paths)
+
+    def _mode(self, scope):
+        if Config.PROFILE_HEADER_ENABLED:
+            requested = dict(scope["headers"]).get(b"x-profile", b"").decode("latin-1").strip().lower()
+            if requested in PROFILE_MODES:
+                return requested
+        if Config.PROFILE_SAMPLE_RATE > 0 and random.random() < Config.PROFILE_SAMPLE_RATE:
+            return Config.PROFILE_SAMPLE_MODE
+        return None
+
+    async def __call__(self, scope, receive, send):
+        mode = self._mode(scope) if scope["type"] == "http" and scope["path"] in self.paths else None
+        if mode is None:
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace(mode, f"{scope['method']} {scope['path']}")
+        os.makedirs(Config.PROFILE_DIR, exist_ok=True)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = [*message.get("headers", []), (b"x-profile-id", trace.id.encode())]
+            await send(message)
+
+        token = _current_span.set(trace.root)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_span.reset(token)
+            trace.root.end = time.perf_counter()
+            document = trace.to_dict(
+                path=scope["path"],
+                status=status,
+                duration_ms=round((trace.root.end - trace.root.start) * 1000, 3),
+            )
+            await asyncio.to_thread(_write_trace, os.path.join(Config.PROFILE_DIR, f"{trace.id}.json"), document)
@@ -0,0 +1,74 @@
+"""Import-time budget check for the API process, based on `python -X importtime`.
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --module app.backend.app --budget-ms 1500 --top 15
+
+Fails (exit code 1) when importing the module takes longer than the budget, or when it
+pulls in any of the heavy libraries that are meant to load lazily during warmup.
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+HEAVY_MODULES = ("torch", "torchvision", "cv2", "PIL", "numpy", "onnxruntime")
+
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def measure(module, runs):
+    """Return the best-of-runs cumulative time (us) and the per-module rows of the fastest run."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    best = None
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            capture_output=True, text=True, cwd=root,
+        )
+        if result.returncode != 0:
+            raise SystemExit(result.stderr)
+
+        rows = []
+        for line in result.stderr.splitlines():
+            match = _LINE.match(line)
+            if match:
+                self_us, cumulative_us, indent, name = match.groups()
+                rows.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+
+        total = next(cumulative for name, _, cumulative, _ in rows if name == module)
+        if best is None or total < best[0]:
+            best = (total, rows)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app.backend.app")
+    parser.add_argument("--budget-ms", type=float, default=1500)
+    parser.add_argument("--runs", type=int, default=3, help="Take the fastest of N cold interpreter starts")
+    parser.add_argument("--top", type=int, default=10, help="Show the N slowest top-level imports")
+    args = parser.parse_args(argv)
+
+    total_us, rows = measure(args.module, args.runs)
+    imported = {name.split(".")[0] for name, *_ in rows}
+    heavy = sorted(imported.intersection(HEAVY_MODULES))
+
+    # Direct children of the measured module: where the time actually goes
+    children = sorted((row for row in rows if row[3] == 1), key=lambda row: row[2], reverse=True)
+    print(f"import {args.module}: {total_us / 1000:.1f} ms (budget {args.budget_ms:.0f} ms)")
+    for name, _, cumulative_us, _ in children[:args.top]:
+        print(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+
+    failed = False
+    if total_us / 1000 > args.budget_ms:
+        print(f"FAIL: over budget by {total_us / 1000 - args.budget_ms:.1f} ms")
+        failed = True
+    if heavy:
+        print(f"FAIL: heavy modules imported eagerly: {', '.join(heavy)}")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
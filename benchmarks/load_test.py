@@ -0,0 +1,363 @@
+"""HTTP load test for the API with latency percentiles, JSON results and a regression gate.
+
+Closed loop: --concurrency virtual users (reached linearly over --ramp seconds) each run
+the scenario back to back. Open loop: scenarios start at a fixed --rate per second
+whatever the latency, and are measured from their scheduled start so queueing in
+the server is not hidden (no coordinated omission).
+
+    # Server on SQLite, started and stopped by the tool (runs `alembic upgrade head` first)
+    python benchmarks/load_test.py --start-server --database-url sqlite+aiosqlite:///loadtest.db \\
+        --mode closed --concurrency 16 --ramp 10 --warmup 10 --duration 60 --output results.json
+
+    # Against a running server (SQLite or Postgres), failing on regressions against a baseline
+    python benchmarks/load_test.py --mode open --rate 20 --duration 60 --baseline baseline.json
+
+The scenario is a comma-separated list of steps: login, upload_image, predict, recognize.
+Requests made during --warmup are not recorded. Exit code 1 means the regression gate failed.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+
+import httpx
+
+ROOT = Path(__file__).resolve().parent.parent
+STEPS = ("login", "upload_image", "predict", "recognize")
+
+
+def percentile(sorted_values, fraction):
+    """Linear-interpolated percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    position = (len(sorted_values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+class Recorder:
+    def __init__(self):
+        self.recording = False
+        self.latencies = defaultdict(list)  # endpoint -> seconds of successful requests
+        self.errors = Counter()
+        self.statuses = defaultdict(Counter)
+        self.started_at = None
+        self.stopped_at = None
+
+    def record(self, endpoint, seconds, status):
+        if not self.recording:
+            return
+        self.statuses[endpoint][str(status)] += 1
+        if isinstance(status, int) and status < 400:
+            self.latencies[endpoint].append(seconds)
+        else:
+            self.errors[endpoint] += 1
+
+    def report(self):
+        window = (self.stopped_at or time.perf_counter()) - (self.started_at or time.perf_counter())
+        endpoints = {}
+        for endpoint in sorted(set(self.latencies) | set(self.errors)):
+            values = sorted(self.latencies[endpoint])
+            total = len(values) + self.errors[endpoint]
+            endpoints[endpoint] = {
+                "requests": total,
+                "errors": self.errors[endpoint],
+                "error_rate": self.errors[endpoint] / total if total else 0.0,
+                "throughput_rps": len(values) / window if window > 0 else 0.0,
+                "mean_ms": sum(values) / len(values) * 1000 if values else None,
+                "p50_ms": _ms(percentile(values, 0.50)),
+                "p95_ms": _ms(percentile(values, 0.95)),
+                "p99_ms": _ms(percentile(values, 0.99)),
+                "max_ms": _ms(values[-1] if values else None),
+                "statuses": dict(self.statuses[endpoint]),
+            }
+        return {"window_seconds": window, "endpoints": endpoints}
+
+
+def _ms(seconds):
+    return None if seconds is None else seconds * 1000
+
+
+class Scenario:
+    def __init__(self, client, recorder, steps, users, images, timeout):
+        self.client = client
+        self.recorder = recorder
+        self.steps = steps
+        self.users = users
+        self.images = images
+        self.timeout = timeout
+        self.tokens = {}
+
+    async def _call(self, endpoint, method, url, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, timeout=self.timeout, **kwargs)
+            status = response.status_code
+        except httpx.TimeoutException:
+            response, status = None, "timeout"
+        except httpx.HTTPError as e:
+            response, status = None, type(e).__name__
+        self.recorder.record(endpoint, time.perf_counter() - start, status)
+        return response if response is not None and response.status_code < 400 else None
+
+    async def _token(self, user, force_login):
+        if force_login or user["user_email"] not in self.tokens:
+            response = await self._call("/login", "POST", "/login", json=user)
+            if response is None:
+                return None
+            self.tokens[user["user_email"]] = response.json()["access_token"]
+        return self.tokens[user["user_email"]]
+
+    async def run_once(self, index):
+        """Run the scenario once; returns False as soon as a step fails."""
+        user = self.users[index % len(self.users)]
+        image = self.images[index % len(self.images)]
+        token = await self._token(user, force_login="login" in self.steps)
+        if token is None:
+            return False
+        headers = {"Authorization": f"Bearer {token}"}
+
+        image_id = None
+        for step in self.steps:
+            if step == "upload_image":
+                files = {"image": (image.name, image.read_bytes(), "image/png")}
+                response = await self._call("/upload_image", "POST", "/upload_image", files=files, headers=headers)
+                if response is None:
+                    return False
+                image_id = response.json()["image_id"]
+            elif step == "predict":
+                body = {"image_id": image_id}
+                response = await self._call("/predict", "POST", "/predict", json=body, headers=headers)
+                if response is None:
+                    return False
+            elif step == "recognize":
+                files = {"image": (image.name, image.read_bytes(), "image/png")}
+                response = await self._call("/recognize", "POST", "/recognize", files=files, headers=headers)
+                if response is None:
+                    return False
+        return True
+
+
+async def closed_loop(scenario, concurrency, ramp, deadline):
+    """Virtual users run scenarios back to back; user k starts at ramp * k / concurrency."""
+    counter = iter(range(sys.maxsize))
+
+    async def virtual_user(k):
+        await asyncio.sleep(ramp * k / concurrency)
+        while time.perf_counter() < deadline:
+            await scenario.run_once(next(counter))
+
+    await asyncio.gather(*(virtual_user(k) for k in range(concurrency)))
+
+
+async def open_loop(scenario, recorder, rate, ramp, deadline, max_in_flight):
+    """Start scenarios at a fixed arrival rate (ramped from 0 over ramp seconds)."""
+    in_flight = set()
+    index = 0
+    start = time.perf_counter()
+    next_at = start
+
+    async def timed(i, scheduled):
+        ok = await scenario.run_once(i)
+        recorder.record("scenario", time.perf_counter() - scheduled, 200 if ok else "failed")
+
+    while next_at < deadline:
+        await asyncio.sleep(max(0.0, next_at - time.perf_counter()))
+        if len(in_flight) >= max_in_flight:
+            recorder.record("scenario", 0.0, "dropped")
+        else:
+            task = asyncio.create_task(timed(index, next_at))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+        index += 1
+        elapsed = next_at - start
+        current_rate = rate * min(1.0, elapsed / ramp) if ramp > 0 else rate
+        next_at += 1.0 / max(current_rate, rate * 0.05)
+
+    if in_flight:
+        await asyncio.wait(in_flight)
+
+
+async def ensure_users(client, users):
+    for user in users:
+        response = await client.post("/signup", json=user, timeout=60)
+        if response.status_code not in (200, 400):  # 400: already registered
+            raise SystemExit(f"Signup failed for {user['user_email']}: {response.status_code} {response.text}")
+
+
+async def wait_for_health(client, timeout):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            response = await client.get("/health", timeout=5)
+            if response.status_code == 200:
+                return response.json()
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.5)
+    raise SystemExit("Server did not become healthy in time")
+
+
+def start_server(args):
+    env = dict(os.environ, DATABASE_URL=args.database_url) if args.database_url else dict(os.environ)
+    subprocess.run([sys.executable, "-m", "alembic", "upgrade", "head"], cwd=ROOT, env=env, check=True)
+    port = args.base_url.rsplit(":", 1)[-1].strip("/")
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.backend.app:app", "--port", port, "--workers", str(args.server_workers)],
+        cwd=ROOT,
+        env=env,
+    )
+
+
+def parse_scenario(scenario):
+    """Split --scenario into steps, refusing unknown steps and a predict with no upload before it."""
+    steps = [step.strip() for step in scenario.split(",") if step.strip()]
+    unknown = set(steps) - set(STEPS)
+    if unknown:
+        raise ValueError(f"unknown scenario steps: {', '.join(sorted(unknown))}")
+    if not steps:
+        raise ValueError("the scenario has no steps")
+    if "predict" in steps and "upload_image" not in steps[:steps.index("predict")]:
+        raise ValueError("the predict step needs an upload_image step before it")
+    return steps
+
+
+def compare(results, baseline, gated, max_regression, max_error_rate_increase):
+    """Return a list of human-readable failures for gated endpoints that regressed."""
+    failures = []
+    for endpoint in gated:
+        current = results["endpoints"].get(endpoint)
+        previous = baseline["endpoints"].get(endpoint)
+        if current is None or previous is None:
+            continue
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            if current[key] is not None and previous[key]:
+                limit = previous[key] * (1 + max_regression)
+                if current[key] > limit:
+                    failures.append(f"{endpoint} {key}: {current[key]:.1f} ms > {limit:.1f} ms allowed")
+        if current["error_rate"] > previous["error_rate"] + max_error_rate_increase:
+            failures.append(f"{endpoint} error rate: {current['error_rate']:.2%} vs {previous['error_rate']:.2%}")
+    return failures
+
+
+async def run(args):
+    images = sorted(Path(args.images).glob("*.png"))
+    if not images:
+        raise SystemExit(f"No .png images in {args.images}")
+    random.Random(args.seed).shuffle(images)
+    users = [
+        {"user_email": f"load_user_{i}@hdrs.com", "user_password": f"load_user_{i}"} for i in range(1, args.users + 1)
+    ]
+
+    limits = httpx.Limits(max_connections=max(args.concurrency, args.max_in_flight) + 8)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits) as client:
+        health = await wait_for_health(client, args.startup_timeout)
+        await ensure_users(client, users)
+
+        recorder = Recorder()
+        scenario = Scenario(client, recorder, args.steps, users, images, args.timeout)
+        start = time.perf_counter()
+        deadline = start + args.warmup + args.duration
+
+        async def begin_recording():
+            await asyncio.sleep(args.warmup)
+            recorder.recording = True
+            recorder.started_at = time.perf_counter()
+
+        recording = asyncio.create_task(begin_recording())
+        if args.mode == "closed":
+            await closed_loop(scenario, args.concurrency, args.ramp, deadline)
+        else:
+            await open_loop(scenario, recorder, args.rate, args.ramp, deadline, args.max_in_flight)
+        recording.cancel()
+        recorder.stopped_at = time.perf_counter()
+
+        metrics = None
+        if args.scrape_metrics:
+            response = await client.get("/metrics", timeout=10)
+            metrics = response.text if response.status_code == 200 else None
+
+    results = recorder.report()
+    results["config"] = {
+        key: getattr(args, key)
+        for key in ("mode", "concurrency", "rate", "ramp", "warmup", "duration", "users", "scenario", "seed")
+    }
+    results["server"] = health
+    results["timestamp"] = time.strftime("%Y-%m-%dT%H:%M:%S%z")
+    if metrics is not None:
+        results["server_metrics"] = metrics
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default=os.getenv("BASE_URL", "http://localhost:8000"))
+    parser.add_argument("--mode", choices=("closed", "open"), default="closed")
+    parser.add_argument("--concurrency", type=int, default=8, help="Closed loop: virtual users")
+    parser.add_argument("--rate", type=float, default=10.0, help="Open loop: scenarios started per second")
+    parser.add_argument("--max-in-flight", type=int, default=256, help="Open loop: scenarios beyond this are dropped")
+    parser.add_argument("--ramp", type=float, default=0.0, help="Seconds to reach full concurrency or rate")
+    parser.add_argument("--warmup", type=float, default=5.0, help="Seconds of load before recording starts")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of recorded load")
+    parser.add_argument("--scenario", default="login,upload_image,predict")
+    parser.add_argument("--users", type=int, default=15)
+    parser.add_argument("--images", default=str(ROOT / "test_images"))
+    parser.add_argument("--timeout", type=float, default=60.0, help="Per-request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=0, help="Shuffles the image order reproducibly")
+    parser.add_argument("--output", help="Write the JSON results here (default: stdout)")
+    parser.add_argument("--baseline", help="Results JSON to compare against")
+    parser.add_argument("--gate", default="/login,/upload_image,/predict", help="Endpoints checked against the baseline")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Allowed latency increase, as a fraction")
+    parser.add_argument("--max-error-rate-increase", type=float, default=0.01)
+    parser.add_argument("--scrape-metrics", action="store_true", help="Attach the server's /metrics to the results")
+    parser.add_argument("--start-server", action="store_true", help="Migrate the database and run uvicorn locally")
+    parser.add_argument("--database-url", help="DATABASE_URL for --start-server, e.g. sqlite+aiosqlite:///loadtest.db")
+    parser.add_argument("--server-workers", type=int, default=1)
+    parser.add_argument("--startup-timeout", type=float, default=120.0)
+    args = parser.parse_args(argv)
+    try:
+        args.steps = parse_scenario(args.scenario)
+    except ValueError as e:
+        parser.error(str(e))
+
+    server = start_server(args) if args.start_server else None
+    try:
+        results = asyncio.run(run(args))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(output)
+    else:
+        print(output)
+
+    for endpoint, stats in results["endpoints"].items():
+        print(
+            f"{endpoint:14} n={stats['requests']:<6} err={stats['error_rate']:6.2%} "
+            f"p50={stats['p50_ms'] or 0:8.1f} p95={stats['p95_ms'] or 0:8.1f} p99={stats['p99_ms'] or 0:8.1f} ms "
+            f"{stats['throughput_rps']:7.2f} rps",
+            file=sys.stderr,
+        )
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        gated = [endpoint.strip() for endpoint in args.gate.split(",") if endpoint.strip()]
+        failures = compare(results, baseline, gated, args.max_regression, args.max_error_rate_increase)
+        for failure in failures:
+            print(f"REGRESSION {failure}", file=sys.stderr)
+        return 1 if failures else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,243 @@
+"""Offline micro-benchmarks of the prediction pipeline stages: no HTTP, no database.
+
+    python benchmarks/pipeline_bench.py --output bench.json
+    python benchmarks/pipeline_bench.py --suites classify --batch-sizes 1,32,256 --threads 1,4 --mode resnet
+
+Suites:
+  segment    segment_with_resnet on every image of --images, rescaled by each of --scales
+  transform  preprocess_crops for --mode on each of --crop-counts real crops (one batched call)
+  classify   classify_batch on random inputs for each of --batch-sizes
+
+Every suite runs once per --threads value (torch.set_num_threads and cv2.setNumThreads).
+Each case reports the min/median wall time over --repeat runs after --warmup runs, the
+mean per-call time of each stage_timer() stage inside it, the peak and net Python/numpy
+allocations of one extra run under tracemalloc (torch's own allocator is not traced),
+and the process's peak RSS after the case. Peak RSS is a high-water mark, so cases run
+from small to large. Results are written as JSON.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+SUITES = ("segment", "transform", "classify")
+
+
+def _ints(value):
+    return [int(item) for item in value.split(",") if item]
+
+
+def _floats(value):
+    return [float(item) for item in value.split(",") if item]
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024
+
+
+def measure(fn, repeat, warmup):
+    """Time fn() and its stage_timer() stages, then count its allocations in one traced run."""
+    from app.metrics import collect_stages, stage_latency
+
+    for _ in range(warmup):
+        fn()
+
+    wall = []
+    stages = {}
+    for _ in range(repeat):
+        with collect_stages() as collected:
+            start = time.perf_counter()
+            fn()
+            wall.append(time.perf_counter() - start)
+        for name, seconds, labels in collected:
+            if name == stage_latency.name:
+                stages.setdefault(labels[0], []).append(seconds)
+
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        fn()
+        after = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    diff = after.compare_to(before, "filename")
+
+    return {
+        "runs": repeat,
+        "min_ms": min(wall) * 1000,
+        "median_ms": statistics.median(wall) * 1000,
+        "mean_ms": statistics.fmean(wall) * 1000,
+        # Per call: a stage timed several times in one call is summed
+        "stages_ms": {stage: sum(values) / repeat * 1000 for stage, values in stages.items()},
+        "alloc_peak_kb": peak / 1024,
+        "alloc_net_kb": sum(stat.size_diff for stat in diff) / 1024,
+        "alloc_net_blocks": sum(stat.count_diff for stat in diff),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def load_images(directory, scales):
+    """Encode every image of directory at each scale, smallest first, as PNG bytes."""
+    import cv2
+
+    cases = []
+    for path in sorted(Path(directory).glob("*.png")):
+        image = cv2.imread(str(path), cv2.IMREAD_UNCHANGED)
+        for scale in scales:
+            scaled = image if scale == 1 else cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            ok, encoded = cv2.imencode(".png", scaled)
+            if not ok:
+                raise SystemExit(f"Could not encode {path} at scale {scale}")
+            cases.append((path.name, scale, scaled.shape[1], scaled.shape[0], encoded.tobytes()))
+    return sorted(cases, key=lambda case: case[2] * case[3])
+
+
+def bench_segment(images, args):
+    from app.image_processing.segmentation import segment_with_resnet
+
+    for name, scale, width, height, encoded in images:
+        crops = sum(len(line) for line in segment_with_resnet(encoded))
+        result = measure(lambda: segment_with_resnet(encoded), args.repeat, args.warmup)
+        yield {"image": name, "scale": scale, "width": width, "height": height, "crops": crops, **result}
+
+
+def bench_transform(images, args):
+    from app.image_processing.predict import preprocess_crops
+    from app.image_processing.segmentation import segment_with_resnet
+    from app.metrics import stage_timer
+
+    def transform(crops):
+        # The stage stack_crops times in the pipeline, for the benchmarked mode
+        with stage_timer("transform"):
+            return preprocess_crops(crops, args.mode)
+
+    pool = [crop.image for *_, encoded in images for line in segment_with_resnet(encoded) for crop in line]
+    if not pool:
+        raise SystemExit("No crops found in the benchmark images")
+
+    for count in sorted(args.crop_counts):
+        crops = [pool[i % len(pool)] for i in range(count)]
+        result = measure(lambda: transform(crops), args.repeat, args.warmup)
+        yield {"crops": count, "per_crop_us": result["median_ms"] * 1000 / count, **result}
+
+
+def load_classifier(args):
+    import torch
+
+    from app.image_processing.architectures import build_model, load_eager_model
+
+    device = torch.device("cpu")
+    if args.model_path and os.path.exists(args.model_path):
+        return load_eager_model(args.model_path, device, args.mode), device
+    # Latency does not depend on the weights, so an untrained model of the same shape will do
+    model = build_model(args.mode)
+    model.eval()
+    return model, device
+
+
+def bench_classify(model, device, args):
+    import torch
+
+    from app.image_processing.model_registry import input_shape
+    from app.image_processing.predict import classify_batch
+
+    generator = torch.Generator().manual_seed(0)
+    for size in sorted(args.batch_sizes):
+        images = torch.rand(size, *input_shape(args.mode), generator=generator) * 2 - 1
+        result = measure(lambda: classify_batch(model, images, device, max_batch_size=size), args.repeat, args.warmup)
+        yield {"batch_size": size, "per_crop_us": result["median_ms"] * 1000 / size, **result}
+
+
+def environment(args):
+    import cv2
+    import numpy
+    import torch
+
+    commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=ROOT)
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": commit.stdout.strip() or None,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "torch": torch.__version__,
+        "opencv": cv2.__version__,
+        "numpy": numpy.__version__,
+        "mode": args.mode,
+        "model_path": args.model_path if args.model_path and os.path.exists(args.model_path) else None,
+        "repeat": args.repeat,
+        "warmup": args.warmup,
+    }
+
+
+def main(argv=None):
+    from app.config import Config
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--suites", default=",".join(SUITES))
+    parser.add_argument("--images", default=str(ROOT / "test_images"))
+    parser.add_argument("--scales", type=_floats, default=[0.5, 1.0, 2.0], help="Image rescale factors")
+    parser.add_argument("--crop-counts", type=_ints, default=[1, 8, 32, 128])
+    parser.add_argument("--batch-sizes", type=_ints, default=[1, 8, 32, 128])
+    parser.add_argument("--threads", type=_ints, default=[1, os.cpu_count() or 1])
+    parser.add_argument("--mode", default=Config.CLASSIFIER_MODE, help="CLASSIFIER_MODE of the classifier")
+    parser.add_argument("--model-path", default=Config.MODEL_PATH, help="Checkpoint; random weights if missing")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--output", help="Write the JSON results here (default: stdout)")
+    args = parser.parse_args(argv)
+
+    suites = [suite.strip() for suite in args.suites.split(",") if suite.strip()]
+    unknown = set(suites) - set(SUITES)
+    if unknown:
+        raise SystemExit(f"Unknown suites: {', '.join(sorted(unknown))}")
+
+    import cv2
+    import torch
+
+    images = load_images(args.images, args.scales) if {"segment", "transform"} & set(suites) else []
+    model, device = load_classifier(args) if "classify" in suites else (None, None)
+
+    results = []
+    for threads in args.threads:
+        torch.set_num_threads(threads)
+        cv2.setNumThreads(threads)
+        runs = {
+            "segment": lambda: bench_segment(images, args),
+            "transform": lambda: bench_transform(images, args),
+            "classify": lambda: bench_classify(model, device, args),
+        }
+        for suite in suites:
+            for row in runs[suite]():
+                row = {"suite": suite, "threads": threads, **row}
+                results.append(row)
+                case = ", ".join(f"{key}={row[key]}" for key in ("image", "scale", "crops", "batch_size") if key in row)
+                print(
+                    f"{suite:9} threads={threads:<2} {case:40} {row['median_ms']:9.2f} ms  "
+                    f"alloc peak {row['alloc_peak_kb']:9.0f} KiB  rss {row['peak_rss_mb']:7.1f} MiB",
+                    file=sys.stderr,
+                )
+
+    output = json.dumps({"environment": environment(args), "results": results}, indent=2)
+    if args.output:
+        Path(args.output).write_text(output)
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,11 +3,18 @@ from logging.config import fileConfig
 from alembic import context
 from sqlalchemy import engine_from_config
 from sqlalchemy import pool
+from sqlalchemy.engine import make_url
 from sqlmodel import SQLModel
 
+import app.db.models  # noqa: F401  (registers the tables on SQLModel.metadata)
 from app.config import Config
 
-DATABASE_URL = Config.DATABASE_URL
+# Migrations run with a synchronous driver; the app itself uses asyncpg / aiosqlite
+_SYNC_DRIVERS = {"postgresql": "postgresql+psycopg2", "sqlite": "sqlite"}
+_url = make_url(Config.DATABASE_URL)
+DATABASE_URL = _url.set(
+    drivername=_SYNC_DRIVERS.get(_url.get_backend_name(), _url.drivername)
+).render_as_string(hide_password=False)
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -0,0 +1,32 @@
+"""add content hash and model version
+
+Revision ID: 3b9f2c1d4e5a
+Revises: 7cc7e6057fdf
+Create Date: 2026-10-18 10:12:41.503117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b9f2c1d4e5a'
+down_revision: Union[str, None] = '7cc7e6057fdf'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('image_uploads', sa.Column('content_hash', sa.String(length=64), nullable=True))
+    op.create_index(op.f('ix_image_uploads_content_hash'), 'image_uploads', ['content_hash'], unique=False)
+    op.add_column('prediction_results', sa.Column('model_version', sa.String(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('prediction_results', 'model_version')
+    op.drop_index(op.f('ix_image_uploads_content_hash'), table_name='image_uploads')
+    op.drop_column('image_uploads', 'content_hash')
@@ -0,0 +1,40 @@
+"""add prediction job state
+
+Revision ID: 5d8e1a7c9b20
+Revises: 3b9f2c1d4e5a
+Create Date: 2026-10-18 14:05:12.284731
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d8e1a7c9b20'
+down_revision: Union[str, None] = '3b9f2c1d4e5a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Batch mode so SQLite can relax the NOT NULL on predicted_digit
+    with op.batch_alter_table('prediction_results') as batch_op:
+        batch_op.alter_column('predicted_digit', existing_type=sa.String(), nullable=True)
+        batch_op.add_column(sa.Column('status', sa.String(length=16), nullable=False, server_default='done'))
+        batch_op.add_column(sa.Column('error', sa.String(), nullable=True))
+        batch_op.add_column(sa.Column('started_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('finished_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DELETE FROM prediction_results WHERE predicted_digit IS NULL")
+    with op.batch_alter_table('prediction_results') as batch_op:
+        batch_op.drop_column('finished_at')
+        batch_op.drop_column('started_at')
+        batch_op.drop_column('error')
+        batch_op.drop_column('status')
+        batch_op.alter_column('predicted_digit', existing_type=sa.String(), nullable=False)
@@ -7,6 +7,9 @@ Create Date: 2025-04-03 23:26:19.121408
 """
 from typing import Sequence, Union
 
+from alembic import op
+import sqlalchemy as sa
+
 # revision identifiers, used by Alembic.
 revision: str = '7cc7e6057fdf'
 down_revision: Union[str, None] = None
@@ -16,13 +19,55 @@ depends_on: Union[str, Sequence[str], None] = None
 
 def upgrade() -> None:
     """Upgrade schema."""
-    # ### commands auto generated by Alembic - please adjust! ###
-    pass
-    # ### end Alembic commands ###
+    # Databases created before schema management moved to Alembic already have these
+    # tables from SQLModel.metadata.create_all(); only create them on a fresh database.
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if 'users' not in existing:
+        op.create_table(
+            'users',
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('user_email', sa.String(), nullable=False),
+            sa.Column('user_password', sa.String(), nullable=False),
+            sa.PrimaryKeyConstraint('user_id'),
+        )
+        op.create_index(op.f('ix_users_user_email'), 'users', ['user_email'], unique=True)
+
+    if 'image_uploads' not in existing:
+        op.create_table(
+            'image_uploads',
+            sa.Column('image_id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('image_path', sa.String(), nullable=False),
+            sa.Column('upload_time', sa.DateTime(), nullable=False),
+            sa.ForeignKeyConstraint(['user_id'], ['users.user_id']),
+            sa.PrimaryKeyConstraint('image_id'),
+        )
+        op.create_index(op.f('ix_image_uploads_image_id'), 'image_uploads', ['image_id'], unique=False)
+        op.create_index(op.f('ix_image_uploads_image_path'), 'image_uploads', ['image_path'], unique=False)
+
+    if 'prediction_results' not in existing:
+        op.create_table(
+            'prediction_results',
+            sa.Column('prediction_id', sa.Integer(), nullable=False),
+            sa.Column('image_id', sa.Integer(), nullable=False),
+            sa.Column('predicted_digit', sa.String(), nullable=False),
+            sa.Column('confidence_score', sa.Float(), nullable=True),
+            sa.Column('prediction_time', sa.DateTime(), nullable=False),
+            sa.ForeignKeyConstraint(['image_id'], ['image_uploads.image_id']),
+            sa.PrimaryKeyConstraint('prediction_id'),
+        )
+        op.create_index(
+            op.f('ix_prediction_results_prediction_id'), 'prediction_results', ['prediction_id'], unique=False
+        )
 
 
 def downgrade() -> None:
     """Downgrade schema."""
-    # ### commands auto generated by Alembic - please adjust! ###
-    pass
-    # ### end Alembic commands ###
+    op.drop_index(op.f('ix_prediction_results_prediction_id'), table_name='prediction_results')
+    op.drop_table('prediction_results')
+    op.drop_index(op.f('ix_image_uploads_image_path'), table_name='image_uploads')
+    op.drop_index(op.f('ix_image_uploads_image_id'), table_name='image_uploads')
+    op.drop_table('image_uploads')
+    op.drop_index(op.f('ix_users_user_email'), table_name='users')
+    op.drop_table('users')
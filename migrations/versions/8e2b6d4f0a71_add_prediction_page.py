@@ -0,0 +1,29 @@
+"""add prediction page
+
+Revision ID: 8e2b6d4f0a71
+Revises: 5d8e1a7c9b20
+Create Date: 2026-10-18 16:40:27.913504
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e2b6d4f0a71'
+down_revision: Union[str, None] = '5d8e1a7c9b20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('prediction_results', sa.Column('page', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('prediction_results') as batch_op:
+        batch_op.drop_column('page')
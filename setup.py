@@ -23,6 +23,7 @@ setup(
         "pydantic",
         "python-dotenv",
         "asyncpg",
+        "aiosqlite",
         "passlib",
         "opencv-python",
         "requests",